@@ -0,0 +1,151 @@
+import csv
+import gc
+import json
+import multiprocessing
+import sys
+from collections import deque
+
+import degrees
+from budget import BudgetExceeded
+
+
+def resolve_person(value):
+    """
+    Returns (person_id, error) for an IMDb id or an unambiguous name,
+    without asking anything interactively.
+    """
+    if value in degrees.people:
+        return value, None
+    person_ids = degrees.names.get(value.lower(), set())
+    if len(person_ids) == 1:
+        return next(iter(person_ids)), None
+    if len(person_ids) > 1:
+        return None, f"Ambiguous name '{value}', use one of {sorted(person_ids)}."
+    suggestions = [candidate["id"] for candidate in degrees.search_people(value, 3)]
+    if suggestions:
+        return None, f"Person '{value}' not found, closest matches are {suggestions}."
+    return None, f"Person '{value}' not found."
+
+
+def read_pairs(lines):
+    """
+    Yields (line number, source, target) for every "source,target" CSV row.
+    """
+    for number, row in enumerate(csv.reader(lines), start=1):
+        if not row:
+            continue
+        if len(row) != 2:
+            raise ValueError(f"line {number}: expected source,target")
+        yield number, row[0].strip(), row[1].strip()
+
+
+def group_by_source(pairs):
+    """
+    Resolve every pair and group resolvable ones by source person.
+    Returns (groups, errors) where groups maps source person_id to a list of
+    (line number, target person_id) and errors is a list of result records.
+    """
+    groups = {}
+    errors = []
+    for number, source, target in pairs:
+        source_id, error = resolve_person(source)
+        if error is None:
+            target_id, error = resolve_person(target)
+        if error is not None:
+            errors.append({"line": number, "source": source, "target": target, "error": error})
+            continue
+        groups.setdefault(source_id, []).append((number, target_id))
+    return groups, errors
+
+
+def run_group(source_id, queries, deadline=None):
+    """
+    Answer every (line number, target) query of one source with a single search.
+    Returns a list of result records. Targets the search has not reached by
+    deadline, a time.monotonic() value, get their lower bound instead.
+    """
+    paths = degrees.shortest_paths(source_id, [target_id for _, target_id in queries], deadline)
+    return [result_record(number, source_id, target_id, paths[target_id]) for number, target_id in queries]
+
+
+def result_record(number, source_id, target_id, path):
+    if isinstance(path, BudgetExceeded):
+        return {"line": number, "source": source_id, "target": target_id, "degrees": None, "path": None,
+                "lower_bound": path.lower_bound}
+    return {
+        "line": number,
+        "source": source_id,
+        "target": target_id,
+        "degrees": None if path is None else len(path),
+        "path": path,
+    }
+
+
+def execute(groups, workers=1, max_in_flight=None):
+    """
+    Run every source group and yield its list of result records, in group order.
+    With more than one worker, groups are fanned out over a forked process pool
+    with at most max_in_flight groups submitted but not yet yielded.
+    """
+    if workers == 1:
+        for source_id, queries in groups.items():
+            yield run_group(source_id, queries)
+        return
+
+    if max_in_flight is None:
+        max_in_flight = 4 * workers
+    # Forked workers inherit the loaded graph copy-on-write instead of having it pickled,
+    # and freezing keeps the collector from touching (and so copying) inherited pages
+    gc.freeze()
+    try:
+        context = multiprocessing.get_context("fork")
+        with context.Pool(workers) as pool:
+            in_flight = deque()
+            for source_id, queries in groups.items():
+                if len(in_flight) >= max_in_flight:
+                    yield in_flight.popleft().get()
+                in_flight.append(pool.apply_async(run_group, (source_id, queries)))
+            while in_flight:
+                yield in_flight.popleft().get()
+    finally:
+        gc.unfreeze()
+
+
+def run_batch(lines, out, workers=1, max_in_flight=None):
+    """
+    Answer every pair in lines, writing one JSON object per result to out
+    in input order, as soon as all earlier lines are answered.
+    """
+    groups, errors = group_by_source(read_pairs(lines))
+    order = sorted([record["line"] for record in errors] +
+                   [number for queries in groups.values() for number, _ in queries])
+    ready = {record["line"]: record for record in errors}
+    position = 0
+    for records in execute(groups, workers, max_in_flight):
+        for record in records:
+            ready[record["line"]] = record
+        while position < len(order) and order[position] in ready:
+            out.write(json.dumps(ready.pop(order[position])) + "\n")
+            position += 1
+        out.flush()
+    # Lines after the last answered query can only be errors
+    for number in order[position:]:
+        out.write(json.dumps(ready.pop(number)) + "\n")
+
+
+def main():
+    if len(sys.argv) not in (3, 4):
+        sys.exit("Usage: python batch.py directory pairs.csv [workers]")
+    directory, pairs_file = sys.argv[1:3]
+    workers = int(sys.argv[3]) if len(sys.argv) == 4 else 1
+
+    print("Loading data...", file=sys.stderr)
+    degrees.load_data(directory, compact=True)
+    print("Data loaded.", file=sys.stderr)
+
+    with open(pairs_file, encoding="utf-8", newline="") as f:
+        run_batch(f, sys.stdout, workers)
+
+
+if __name__ == "__main__":
+    main()
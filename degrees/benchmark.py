@@ -0,0 +1,134 @@
+import argparse
+import heapq
+import json
+import os
+import random
+import resource
+import sys
+import time
+
+import batch
+import degrees
+from profiling import json_lines
+
+
+def bench_bidirectional(pairs, profile=None):
+    """
+    Compare the one-sided and bidirectional searches on the same pairs.
+    With profile set to a file, every query's profiling record is written
+    to it as a line of JSON and each mode's histograms are printed.
+    """
+    for name, bidirectional in {"queue": False, "bidirectional": True}.items():
+        profiler = degrees.enable_profiling(sink=None if profile is None else json_lines(profile))
+        lengths = []
+        try:
+            for source, target in pairs:
+                path = degrees.shortest_path(source, target, bidirectional)
+                lengths.append(None if path is None else len(path))
+        finally:
+            degrees.disable_profiling()
+        expanded = sum(record["nodes_expanded"] for record in profiler.records)
+        elapsed = sum(record["latency_seconds"] for record in profiler.records)
+        print(f"{name:>14}: {expanded} people expanded, {elapsed:.4f}s")
+        if profile is not None:
+            print(json.dumps(profiler.summary(), indent=2))
+        yield name, lengths
+
+
+def bench_parallel(pairs, max_workers):
+    """
+    Time the batch executor on the same pairs with 1, 2, 4, ... workers.
+    """
+    groups = {}
+    for number, (source, target) in enumerate(pairs, start=1):
+        groups.setdefault(source, []).append((number, target))
+    baseline = None
+    workers = 1
+    while workers <= max_workers:
+        start = time.perf_counter()
+        results = [record["degrees"] for records in batch.execute(groups, workers) for record in records]
+        elapsed = time.perf_counter() - start
+        baseline = baseline or elapsed
+        print(f"{workers:>3} workers: {elapsed:.4f}s, speedup {baseline / elapsed:.2f}x")
+        yield workers, results
+        workers *= 2
+
+
+def bench_hubs(pairs):
+    """
+    Compare co-stars scanned by bidirectional searches that expand every cast
+    of a person against ones that scan each movie's cast once per search.
+    """
+    graph = degrees.graph
+
+    def every_cast(person, seen_movies):
+        return graph.neighbors(person)
+
+    for name, neighbors_of in {"every cast": every_cast, "unseen casts": graph.unseen_neighbors}.items():
+        scanned = 0
+
+        def counting_neighbors(person, seen_movies):
+            nonlocal scanned
+            for pair in neighbors_of(person, seen_movies):
+                scanned += 1
+                yield pair
+
+        lengths = []
+        start = time.perf_counter()
+        for source, target in pairs:
+            path = degrees.bidirectional_search(graph.person_index[source], graph.person_index[target],
+                                                counting_neighbors)
+            lengths.append(None if path is None else len(path))
+        print(f"{name:>14}: {scanned} co-stars scanned, {time.perf_counter() - start:.4f}s")
+        yield name, lengths
+
+
+def hub_pairs(rng, queries):
+    """
+    Pairs whose source is among the people with the costliest expansions.
+    """
+    graph = degrees.graph
+    offsets = graph.movie_offsets
+
+    def expansion_cost(person):
+        return sum(offsets[movie + 1] - offsets[movie] for movie in graph.movies_of(person))
+
+    hubs = heapq.nlargest(queries, range(len(graph.person_ids)), key=expansion_cost)
+    return [(graph.person_ids[hub], rng.choice(graph.person_ids)) for hub in hubs]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark degrees searches.")
+    parser.add_argument("directory", nargs="?", default="large")
+    parser.add_argument("queries", nargs="?", type=int, default=100)
+    parser.add_argument("--compact", action="store_true", help="load the compact graph")
+    parser.add_argument("--mode", choices=("bidirectional", "parallel", "hubs"), default="bidirectional")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="largest worker count for --mode parallel")
+    parser.add_argument("--profile", type=argparse.FileType("w"),
+                        help="JSON lines file for per query profiles in --mode bidirectional")
+    args = parser.parse_args()
+
+    print("Loading data...")
+    start = time.perf_counter()
+    degrees.load_data(args.directory, compact=args.compact or args.mode == "hubs")
+    print(f"Data loaded in {time.perf_counter() - start:.2f}s, "
+          f"peak memory {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // 1024} MB.")
+
+    rng = random.Random(0)
+    person_ids = sorted(degrees.people)
+    pairs = [(rng.choice(person_ids), rng.choice(person_ids)) for _ in range(args.queries)]
+
+    if args.mode == "hubs":
+        pairs = hub_pairs(rng, args.queries)
+        results = dict(bench_hubs(pairs))
+    elif args.mode == "parallel":
+        results = dict(bench_parallel(pairs, args.workers))
+    else:
+        results = dict(bench_bidirectional(pairs, args.profile))
+    if len(set(map(tuple, results.values()))) != 1:
+        sys.exit("Searches disagree on path lengths.")
+
+
+if __name__ == "__main__":
+    main()
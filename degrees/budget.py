@@ -0,0 +1,45 @@
+import time
+
+
+class OutOfBudget(Exception):
+    """
+    Raised by a budgeted neighbors function, caught by the search using it.
+    """
+
+
+class BudgetExceeded():
+    """
+    shortest_path result for a search that ran out of budget before finding
+    a path or proving there is none: the target is at least lower_bound
+    degrees away.
+    """
+
+    def __init__(self, lower_bound):
+        self.lower_bound = lower_bound
+
+    def __repr__(self):
+        return f"BudgetExceeded(lower_bound={self.lower_bound})"
+
+    def __eq__(self, other):
+        return isinstance(other, BudgetExceeded) and other.lower_bound == self.lower_bound
+
+
+def budgeted(neighbors_of, deadline=None, max_expansions=None):
+    """
+    Returns a neighbors_of(person, seen_movies) that raises OutOfBudget
+    instead of expanding a person once max_expansions people were expanded
+    or time.monotonic() passed deadline.
+    """
+    expansions = 0
+    clock = time.monotonic
+
+    def charged(person, seen_movies):
+        nonlocal expansions
+        expansions += 1
+        if max_expansions is not None and expansions > max_expansions:
+            raise OutOfBudget()
+        if deadline is not None and clock() > deadline:
+            raise OutOfBudget()
+        return neighbors_of(person, seen_movies)
+
+    return charged
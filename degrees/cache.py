@@ -0,0 +1,178 @@
+import heapq
+import time
+from array import array
+from collections import OrderedDict
+
+from graph import CompactGraph, INDEX_TYPE
+
+# Distance and parent value of people a landmark does not reach
+UNREACHABLE = -1
+
+
+def reverse_path(source, path):
+    """
+    Returns the path from the last person of a source to target path back to source.
+    """
+    people = [source] + [person_id for _, person_id in path]
+    return [(path[i][0], people[i]) for i in range(len(path) - 1, -1, -1)]
+
+
+class PathCache():
+    """
+    Bounded least recently used cache of shortest paths.
+    Keys are symmetric, so a cached source to target path also answers
+    the target to source query.
+    """
+
+    def __init__(self, size=10000):
+        self.size = size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, source, target):
+        """
+        Returns (True, path) on a hit, where path is None for people known
+        not to be connected, or (False, None) on a miss.
+        """
+        key = (source, target) if source <= target else (target, source)
+        try:
+            path = self.entries[key]
+        except KeyError:
+            self.misses += 1
+            return False, None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        if path is None or key[0] == source:
+            return True, path
+        return True, reverse_path(target, path)
+
+    def put(self, source, target, path):
+        if source <= target:
+            key = (source, target)
+        else:
+            key = (target, source)
+            path = None if path is None else reverse_path(source, path)
+        self.entries[key] = path
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "capacity": self.size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+class LandmarkIndex():
+    """
+    Breadth first search trees rooted at the people with the most movies,
+    over a CompactGraph.
+    Distances to the landmarks bound the distance between any two people.
+    """
+
+    def __init__(self, graph: CompactGraph, count=8):
+        start = time.perf_counter()
+        self.graph = graph
+        offsets = graph.person_offsets
+        self.landmarks = heapq.nlargest(count, range(len(graph.person_ids)),
+                                        key=lambda person: offsets[person + 1] - offsets[person])
+        # One distance and parent (movie, person) array per landmark, indexed by person
+        self.distances = []
+        self.parent_movies = []
+        self.parent_people = []
+        for landmark in self.landmarks:
+            distances, parent_movies, parent_people = self.search_tree(landmark)
+            self.distances.append(distances)
+            self.parent_movies.append(parent_movies)
+            self.parent_people.append(parent_people)
+        self.build_seconds = time.perf_counter() - start
+
+    def search_tree(self, root):
+        """
+        Breadth first search from root over the whole graph.
+        Returns arrays of distance, parent movie and parent person per person.
+        """
+        count = len(self.graph.person_ids)
+        distances = array(INDEX_TYPE, [UNREACHABLE]) * count
+        parent_movies = array(INDEX_TYPE, [UNREACHABLE]) * count
+        parent_people = array(INDEX_TYPE, [UNREACHABLE]) * count
+        distances[root] = 0
+        seen_movies = set()
+        layer = [root]
+        depth = 0
+        while layer:
+            depth += 1
+            next_layer = []
+            for person in layer:
+                for movie, neighbor in self.graph.unseen_neighbors(person, seen_movies):
+                    if distances[neighbor] != UNREACHABLE:
+                        continue
+                    distances[neighbor] = depth
+                    parent_movies[neighbor] = movie
+                    parent_people[neighbor] = person
+                    next_layer.append(neighbor)
+            layer = next_layer
+        return distances, parent_movies, parent_people
+
+    def lower_bound(self, source, target):
+        """
+        Returns a lower bound on the distance between two connected people.
+        """
+        bound = 0
+        for distances in self.distances:
+            source_distance = distances[source]
+            if source_distance != UNREACHABLE:
+                bound = max(bound, abs(source_distance - distances[target]))
+        return bound
+
+    def bounds(self, source, target):
+        """
+        Returns (lower, upper, landmark) for two connected people, where upper is
+        the shortest detour through a landmark and landmark the position of that
+        landmark, or upper and landmark are None if no landmark reaches them.
+        """
+        lower, upper, via = 0, None, None
+        for i, distances in enumerate(self.distances):
+            source_distance = distances[source]
+            if source_distance == UNREACHABLE:
+                continue
+            target_distance = distances[target]
+            lower = max(lower, abs(source_distance - target_distance))
+            if upper is None or source_distance + target_distance < upper:
+                upper, via = source_distance + target_distance, i
+        return lower, upper, via
+
+    def path_via(self, source, target, landmark):
+        """
+        Returns the path of (movie, person) indexes from source to target
+        through the landmark at the given position.
+        """
+        parent_movies = self.parent_movies[landmark]
+        parent_people = self.parent_people[landmark]
+        rs = []
+        person = source
+        while parent_people[person] != UNREACHABLE:
+            rs.append((parent_movies[person], parent_people[person]))
+            person = parent_people[person]
+        tail = []
+        person = target
+        while parent_people[person] != UNREACHABLE:
+            tail.append((parent_movies[person], person))
+            person = parent_people[person]
+        tail.reverse()
+        return rs + tail
+
+    def stats(self):
+        return {
+            "landmarks": len(self.landmarks),
+            "build_seconds": self.build_seconds,
+        }
@@ -1,56 +1,104 @@
-import csv
 import sys
 
+from budget import BudgetExceeded, OutOfBudget, budgeted
+from cache import LandmarkIndex, PathCache
+from graph import ARRAYS, CompactGraph
+from ingest import CHUNK_SIZE, ingest
+from metadata import MOVIE_FIELDS, PERSON_FIELDS, RecordTable
+from nameindex import NameIndex
+from paths import enumerate_paths, ranked_paths, shortest_path_dag
+from profiling import Profiler
+from snapshot import fingerprint, read_snapshot, write_snapshot
 from util import Node, StackFrontier, QueueFrontier
 
 # Maps names to a set of corresponding person_ids
 names = {}
 
+# Prefix and fuzzy NameIndex over the keys of names, see build_name_index
+name_index = None
+
 # Maps person_ids to a dictionary of: name, birth, movies (a set of movie_ids)
 people = {}
 
 # Maps movie_ids to a dictionary of: title, year, stars (a set of person_ids)
 movies = {}
 
+# Maps person_ids to the label of their connected component
+components = {}
+
+# Maps component labels merged by add_star to the label they were merged into
+merged_components = {}
+
+# Compact adjacency replacing the movies/stars sets and components when loaded with compact=True
+graph = None
+
+# Optional query accelerators, see enable_cache and build_landmarks
+path_cache = None
+landmarks = None
+landmark_pruning = False
+
+# Per query instrumentation, see enable_profiling
+profiler = None
 
-def load_data(directory):
+# Byte size of every CSV when it was loaded, where follow starts reading appended rows
+loaded_sizes = {}
+
+
+def load_data(directory, compact=False, use_snapshot=True, chunk_size=CHUNK_SIZE, spill_threshold=None,
+              progress=False, index_names=False):
     """
     Load data from CSV files into memory.
+    With compact set, adjacency is kept in a CompactGraph instead of
+    the "movies" and "stars" sets, and people and movies become RecordTables
+    decoding their metadata only when it is looked up.
+    With use_snapshot set, a binary snapshot is written next to the CSVs
+    and memory mapped instead of parsing them on later loads while they are unchanged.
+    CSVs are streamed chunk_size rows at a time, see ingest for spill_threshold,
+    the bytes of star credits held in memory before they move to temporary
+    files, and progress.
+    With index_names set, the name index used by search_people is built
+    up front instead of on the first search.
     """
-    # Load people
-    with open(f"{directory}/people.csv", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            people[row["id"]] = {
-                "name": row["name"],
-                "birth": row["birth"],
-                "movies": set()
-            }
-            if row["name"].lower() not in names:
-                names[row["name"].lower()] = {row["id"]}
-            else:
-                names[row["name"].lower()].add(row["id"])
-
-    # Load movies
-    with open(f"{directory}/movies.csv", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            movies[row["id"]] = {
-                "title": row["title"],
-                "year": row["year"],
-                "stars": set()
-            }
-
-    # Load stars
-    with open(f"{directory}/stars.csv", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
+    global graph, people, movies
+
+    sources = fingerprint(directory)
+    loaded_sizes.update((name, size) for name, (size, _) in sources.items())
+    cached = read_snapshot(directory) if use_snapshot else None
+    if cached is None:
+        cached = ingest(directory, chunk_size, spill_threshold, progress)
+        if use_snapshot:
             try:
-                people[row["person_id"]]["movies"].add(row["movie_id"])
-                movies[row["movie_id"]]["stars"].add(row["person_id"])
-            except KeyError:
+                write_snapshot(directory, *cached, sources)
+                cached = read_snapshot(directory) or cached
+            except OSError:
+                # A read-only data directory only costs us the faster restart
                 pass
 
+    metadata, arrays = cached
+    graph = CompactGraph(metadata["person_ids"], metadata["movie_ids"],
+                         *(arrays[name] for name in ARRAYS))
+    names.update(metadata["names"])
+    person_records = RecordTable(graph.person_index, PERSON_FIELDS,
+                                 arrays["person_records"], arrays["person_data"])
+    movie_records = RecordTable(graph.movie_index, MOVIE_FIELDS,
+                                arrays["movie_records"], arrays["movie_data"])
+
+    if compact:
+        people = person_records
+        movies = movie_records
+    else:
+        for i, person_id in enumerate(graph.person_ids):
+            people[person_id] = person_records[person_id]
+            people[person_id]["movies"] = {graph.movie_ids[movie] for movie in graph.movies_of(i)}
+        for i, movie_id in enumerate(graph.movie_ids):
+            movies[movie_id] = movie_records[movie_id]
+            movies[movie_id]["stars"] = {graph.person_ids[person] for person in graph.stars_of(i)}
+        components.update(zip(graph.person_ids, graph.components))
+        graph = None
+
+    if index_names:
+        build_name_index()
+
 
 def main():
     if len(sys.argv) > 2:
@@ -84,26 +132,476 @@ def main():
             print(f"{i + 1}: {person1} and {person2} starred in {movie}")
 
 
-def shortest_path(source, target):
+def shortest_path(source, target, bidirectional=False, deadline=None, max_expansions=None):
+    """
+    Returns the shortest list of (movie_id, person_id) pairs
+    that connect the source to the target.
+
+    If no possible path, returns None.
+    Set bidirectional to search from both ends at once.
+    If the search expands more than max_expansions people or is still running
+    at deadline, a time.monotonic() value, returns a BudgetExceeded instead.
+    """
+    probe = None if profiler is None else profiler.start(source, target)
+    if path_cache is not None:
+        hit, path = path_cache.get(source, target)
+        if hit:
+            if probe is not None:
+                profiler.finish(probe, path, cached=True)
+            return path
+    path = find_path(source, target, bidirectional, probe, deadline, max_expansions)
+    exceeded = isinstance(path, BudgetExceeded)
+    if path_cache is not None and not exceeded:
+        path_cache.put(source, target, path)
+    if probe is not None:
+        profiler.finish(probe, None if exceeded else path, exceeded=exceeded)
+    return path
+
+
+def find_path(source, target, bidirectional, probe=None, deadline=None, max_expansions=None):
+    """
+    Search for the shortest path without consulting the path cache,
+    measuring the search with probe if given.
+    """
+    search = bidirectional_search if bidirectional else breadth_first_search
+    if not connected(source, target):
+        return None
+    neighbors_of = unseen_neighbors if graph is None else graph.unseen_neighbors
+    if deadline is not None or max_expansions is not None:
+        neighbors_of = budgeted(neighbors_of, deadline, max_expansions)
+    if probe is not None:
+        neighbors_of = probe.wrap(neighbors_of)
+    if graph is None:
+        return search(source, target, neighbors_of)
+    source, target = graph.person_index[source], graph.person_index[target]
+    if landmarks is not None:
+        path = landmark_search(source, target, neighbors_of)
+    else:
+        path = search(source, target, neighbors_of)
+    return path if path is None or isinstance(path, BudgetExceeded) else graph.path_ids(path)
+
+
+def landmark_search(source, target, neighbors_of):
+    """
+    Shortest path between two person indexes using the landmark index:
+    tight landmark bounds are answered from the landmark trees and anything
+    else by a bidirectional search, which with landmark pruning enabled
+    skips people whose lower bound rules out a shortest path.
+    """
+    lower, upper, via = landmarks.bounds(source, target)
+    if upper is not None and lower == upper:
+        return landmarks.path_via(source, target, via)
+    if upper is None or not landmark_pruning:
+        path = bidirectional_search(source, target, neighbors_of)
+    else:
+        def pruned(person, depth, endpoint):
+            return depth + landmarks.lower_bound(person, endpoint) > upper
+
+        path = bidirectional_search(source, target, neighbors_of, pruned)
+    if isinstance(path, BudgetExceeded) and lower > path.lower_bound:
+        return BudgetExceeded(lower)
+    return path
+
+
+def all_shortest_paths(source, target, limit=1000, movie_cost=None):
+    """
+    Yields up to limit distinct shortest paths from source to target,
+    generated lazily from the shortest path DAG.
+    With movie_cost, a function of a movie_id such as newer_movies_first,
+    paths come in order of lowest total cost, otherwise in no particular order.
+    """
+    if not connected(source, target):
+        return
+    neighbors_of = neighbors_for_person
+    cost = movie_cost
+    if graph is not None:
+        source, target = graph.person_index[source], graph.person_index[target]
+        neighbors_of = graph.neighbors
+        if movie_cost is not None:
+            cost = lambda movie: movie_cost(graph.movie_ids[movie])
+    found = shortest_path_dag(source, target, neighbors_of)
+    if found is None:
+        return
+    dag, depths = found
+    if cost is None:
+        paths = enumerate_paths(source, target, dag, limit)
+    else:
+        paths = ranked_paths(source, target, dag, depths, limit, cost)
+    for path in paths:
+        yield path if graph is None else graph.path_ids(path)
+
+
+def newer_movies_first(movie_id):
+    """
+    Path cost favouring recent movies, for all_shortest_paths.
+    """
+    year = movies[movie_id]["year"]
+    return -int(year) if year else 0
+
+
+def bigger_casts_first(movie_id):
+    """
+    Path cost favouring movies with more stars, a proxy for popularity.
+    """
+    if graph is None:
+        return -len(movies[movie_id]["stars"])
+    return -len(graph.stars_of(graph.movie_index[movie_id]))
+
+
+def connected(source, target):
+    """
+    Returns False if two people are known to be in different components, in O(1).
+    Removing credits never merges components, so after removals this may
+    still return True for people who are no longer connected.
+    """
+    return component_of(source) == component_of(target)
+
+
+def component_of(person_id):
+    """
+    Returns the component label of a person, following merges made at runtime.
+    """
+    label = components.get(person_id)
+    if label is None:
+        label = graph.components[graph.person_index[person_id]]
+    while label in merged_components:
+        label = merged_components[label]
+    return label
+
+
+def add_person(person_id, name, birth):
+    """
+    Add a person without movies.
+    """
+    if person_id in people:
+        raise ValueError(f"person {person_id} already exists")
+    if graph is None:
+        people[person_id] = {"name": name, "birth": birth, "movies": set()}
+    else:
+        graph.add_person(person_id)
+        people[person_id] = {"name": name, "birth": birth}
+    names.setdefault(name.lower(), set()).add(person_id)
+    if name_index is not None:
+        name_index.add(name.lower())
+    # A new person is alone in a component labelled by their id
+    components[person_id] = person_id
+
+
+def add_movie(movie_id, title, year):
+    """
+    Add a movie without stars.
+    """
+    if movie_id in movies:
+        raise ValueError(f"movie {movie_id} already exists")
+    if graph is None:
+        movies[movie_id] = {"title": title, "year": year, "stars": set()}
+    else:
+        graph.add_movie(movie_id)
+        movies[movie_id] = {"title": title, "year": year}
+
+
+def add_star(person_id, movie_id):
+    """
+    Credit a person in a movie, merging components if needed.
+    """
+    if person_id not in people or movie_id not in movies:
+        raise KeyError((person_id, movie_id))
+    if graph is None:
+        co_stars = movies[movie_id]["stars"]
+        if movie_id in people[person_id]["movies"]:
+            return
+        people[person_id]["movies"].add(movie_id)
+        co_star = next(iter(co_stars), None)
+        co_stars.add(person_id)
+    else:
+        person = graph.person_index[person_id]
+        movie = graph.movie_index[movie_id]
+        stars = graph.stars_of(movie)
+        co_star = graph.person_ids[stars[0]] if len(stars) else None
+        if not graph.add_star(person, movie):
+            return
+    if co_star is not None:
+        label, other = component_of(person_id), component_of(co_star)
+        if label != other:
+            merged_components[label] = other
+    invalidate_queries()
+
+
+def remove_star(person_id, movie_id):
+    """
+    Remove a person's credit in a movie.
+    """
+    if graph is None:
+        people[person_id]["movies"].discard(movie_id)
+        movies[movie_id]["stars"].discard(person_id)
+    else:
+        graph.remove_star(graph.person_index[person_id], graph.movie_index[movie_id])
+    invalidate_queries()
+
+
+def remove_person(person_id):
+    """
+    Remove a person and all their credits.
+    """
+    person = people[person_id]
+    if graph is None:
+        for movie_id in person["movies"]:
+            movies[movie_id]["stars"].discard(person_id)
+    else:
+        graph.remove_person(person_id)
+    del people[person_id]
+    components.pop(person_id, None)
+    name_ids = names[person["name"].lower()]
+    name_ids.discard(person_id)
+    if not name_ids:
+        del names[person["name"].lower()]
+        if name_index is not None:
+            name_index.remove(person["name"].lower())
+    invalidate_queries()
+
+
+def remove_movie(movie_id):
+    """
+    Remove a movie and all its credits.
+    """
+    if graph is None:
+        for person_id in movies[movie_id]["stars"]:
+            people[person_id]["movies"].discard(movie_id)
+    else:
+        graph.remove_movie(movie_id)
+    del movies[movie_id]
+    invalidate_queries()
+
+
+def invalidate_queries():
+    """
+    Drop query accelerators made stale by a data change: cached paths may no
+    longer be shortest and landmark distances no longer exact.
+    """
+    global landmarks
+    if path_cache is not None:
+        path_cache.clear()
+    landmarks = None
+
+
+def enable_cache(size=10000):
+    """
+    Cache up to size shortest_path results, see PathCache.
+    """
+    global path_cache
+    path_cache = PathCache(size)
+
+
+def enable_profiling(keep=10000, sink=None):
+    """
+    Measure every shortest_path call, see Profiler. Returns the profiler.
+    While disabled, the only cost left in shortest_path is one check.
+    """
+    global profiler
+    profiler = Profiler(keep, sink)
+    return profiler
+
+
+def disable_profiling():
+    global profiler
+    profiler = None
+
+
+def build_landmarks(count=8, prune=False):
+    """
+    Build a LandmarkIndex over the compact graph for shortest_path to use.
+    Pruning costs a bound computation per reached person, so it only pays off
+    when the landmark bounds are tight for most queries.
+    """
+    global landmarks, landmark_pruning
+    if graph is None:
+        raise ValueError("landmarks need data loaded with compact=True")
+    landmarks = LandmarkIndex(graph, count)
+    landmark_pruning = prune
+
+
+def breadth_first_search(source, target, neighbors_of):
+    """
+    One sided breadth first search from source using a QueueFrontier.
+    neighbors_of(person, seen_movies) is unseen_neighbors or its CompactGraph
+    counterpart, here and in the other searches. If it raises OutOfBudget,
+    the search returns a BudgetExceeded.
+    """
     frontier = QueueFrontier()
     explored_person = set()
+    seen_movies = set()
     root = Node(source, None, None)
     frontier.add(root)
     explored_person.add(source)
-    while not frontier.empty():
-        extracted_node: Node = frontier.remove()
-        neighbors = neighbors_for_person(extracted_node.state)
-        if extracted_node.state == target:
-            return build_path(extracted_node)
-        for neighbor in neighbors:
-            if neighbor[1] in explored_person:
-                continue
-            explored_person.add(neighbor[1])
-            neighborNode = Node(neighbor[1], extracted_node, neighbor[0])
-            frontier.add(neighborNode)
+    try:
+        while not frontier.empty():
+            extracted_node: Node = frontier.remove()
+            if extracted_node.state == target:
+                return build_path(extracted_node)
+            for neighbor in neighbors_of(extracted_node.state, seen_movies):
+                if neighbor[1] in explored_person:
+                    continue
+                explored_person.add(neighbor[1])
+                neighborNode = Node(neighbor[1], extracted_node, neighbor[0])
+                frontier.add(neighborNode)
+    except OutOfBudget:
+        # Everyone closer than the person being expanded was dequeued, and is not target
+        return BudgetExceeded(max(len(build_path(extracted_node)), 1))
     return None
 
 
+def bidirectional_search(source, target, neighbors_of, pruned=None):
+    """
+    Breadth first search grown from both source and target.
+    The smaller frontier is expanded one whole layer at a time and the
+    search stops as soon as the two sides meet.
+    pruned(person, depth, endpoint) may return True for a person reached at
+    depth from one side who cannot lie on a shortest path to the other endpoint.
+    """
+    if source == target:
+        return []
+    # Maps a reached person to (movie_id, person_id) of the step towards its root
+    forward_parents = {source: None}
+    backward_parents = {target: None}
+    forward_layer = [source]
+    backward_layer = [target]
+    forward_depth = backward_depth = 0
+    # Each side scans a movie's cast only the first time it reaches the movie
+    forward_movies = set()
+    backward_movies = set()
+    skip = None
+    while forward_layer and backward_layer:
+        try:
+            if len(forward_layer) <= len(backward_layer):
+                forward_depth += 1
+                if pruned is not None:
+                    skip = lambda person: pruned(person, forward_depth, target)
+                forward_layer, meeting = expand_layer(forward_layer, forward_parents, backward_parents,
+                                                      neighbors_of, forward_movies, skip)
+            else:
+                backward_depth += 1
+                if pruned is not None:
+                    skip = lambda person: pruned(person, backward_depth, source)
+                backward_layer, meeting = expand_layer(backward_layer, backward_parents, forward_parents,
+                                                       neighbors_of, backward_movies, skip)
+        except OutOfBudget:
+            # Everyone within the depths of the fully expanded layers was reached
+            # from one side without the sides meeting, so the ends are farther
+            # apart than those depths added up
+            return BudgetExceeded(forward_depth + backward_depth)
+        if meeting is not None:
+            return join_paths(meeting, forward_parents, backward_parents)
+    return None
+
+
+def expand_layer(layer, parents, other_parents, neighbors_of, seen_movies, skip=None):
+    """
+    Expand every person in a layer, recording parents for newly reached people
+    unless skip returns True for them.
+    Returns the next layer and the first person already reached by the other side.
+    """
+    next_layer = []
+    for person_id in layer:
+        for movie_id, neighbor in neighbors_of(person_id, seen_movies):
+            if neighbor in parents or (skip is not None and skip(neighbor)):
+                continue
+            parents[neighbor] = (movie_id, person_id)
+            if neighbor in other_parents:
+                return next_layer, neighbor
+            next_layer.append(neighbor)
+    return next_layer, None
+
+
+def join_paths(meeting, forward_parents, backward_parents):
+    """
+    Join the forward and backward parent chains at the meeting person
+    into a source to target path.
+    """
+    rs = trace_path(meeting, forward_parents)
+    person_id = meeting
+    while backward_parents[person_id] is not None:
+        movie_id, child = backward_parents[person_id]
+        rs.append((movie_id, child))
+        person_id = child
+    return rs
+
+
+def trace_path(person_id, parents):
+    """
+    Build a path from the root of a parents map to person_id.
+    """
+    rs = []
+    while parents[person_id] is not None:
+        movie_id, parent = parents[person_id]
+        rs.append((movie_id, person_id))
+        person_id = parent
+    rs.reverse()
+    return rs
+
+
+def shortest_paths(source, targets, deadline=None, max_expansions=None):
+    """
+    Returns a dict mapping every target to its shortest path from source,
+    or None if not connected, found with a single breadth first search.
+    With a budget, as for shortest_path, targets not reached once it runs
+    out map to a BudgetExceeded instead.
+    """
+    reachable = [target for target in targets if connected(source, target)]
+    neighbors_of = unseen_neighbors if graph is None else graph.unseen_neighbors
+    if deadline is not None or max_expansions is not None:
+        neighbors_of = budgeted(neighbors_of, deadline, max_expansions)
+    if graph is None:
+        paths = single_source_search(source, reachable, neighbors_of)
+        return {target: paths.get(target) for target in targets}
+    source = graph.person_index[source]
+    reachable = [graph.person_index[target] for target in reachable]
+    paths = single_source_search(source, reachable, neighbors_of)
+    paths = {
+        graph.person_ids[target]: path if path is None or isinstance(path, BudgetExceeded) else graph.path_ids(path)
+        for target, path in paths.items()
+    }
+    return {target: paths.get(target) for target in targets}
+
+
+def single_source_search(source, targets, neighbors_of):
+    """
+    Breadth first search from source that stops once every target is reached,
+    so unreachable targets should be filtered out beforehand. If neighbors_of
+    raises OutOfBudget, targets not reached yet map to a BudgetExceeded.
+    """
+    remaining = set(targets)
+    parents = {source: None}
+    seen_movies = set()
+    paths = {}
+    if source in remaining:
+        paths[source] = []
+        remaining.discard(source)
+    layer = [source]
+    depth = 0
+    try:
+        while layer and remaining:
+            next_layer = []
+            for person_id in layer:
+                for movie_id, neighbor in neighbors_of(person_id, seen_movies):
+                    if neighbor in parents:
+                        continue
+                    parents[neighbor] = (movie_id, person_id)
+                    next_layer.append(neighbor)
+                    if neighbor in remaining:
+                        paths[neighbor] = trace_path(neighbor, parents)
+                        remaining.discard(neighbor)
+                if not remaining:
+                    break
+            layer = next_layer
+            depth += 1
+    except OutOfBudget:
+        # The whole layer at depth was already checked against the targets
+        paths.update(dict.fromkeys(remaining, BudgetExceeded(depth + 1)))
+        return paths
+    paths.update(dict.fromkeys(remaining))
+    return paths
+
+
 def build_path(node: Node) -> list[tuple[int, int]]:
     """
     Build a path from this Node to source
@@ -115,6 +613,30 @@ def build_path(node: Node) -> list[tuple[int, int]]:
     return rs
 
 
+def build_name_index():
+    """
+    Build the NameIndex used by search_people.
+    """
+    global name_index
+    name_index = NameIndex(names)
+    return name_index
+
+
+def search_people(query, limit=10, max_distance=2):
+    """
+    Returns up to limit candidate people for a name without prompting,
+    ranked by exact name, then prefix, then names within max_distance edits.
+    Each candidate is a dict of id, name, birth and distance.
+    """
+    index = name_index if name_index is not None else build_name_index()
+    rs = []
+    for _, distance, name in index.search(query.strip().lower(), limit, max_distance):
+        for person_id in sorted(names[name]):
+            person = people[person_id]
+            rs.append({"id": person_id, "name": person["name"], "birth": person["birth"], "distance": distance})
+    return rs[:limit]
+
+
 def person_id_for_name(name):
     """
     Returns the IMDB id for a person's name,
@@ -122,6 +644,9 @@ def person_id_for_name(name):
     """
     person_ids = list(names.get(name.lower(), set()))
     if len(person_ids) == 0:
+        suggestions = [candidate["name"] for candidate in search_people(name, 5)]
+        if suggestions:
+            print(f"Did you mean: {', '.join(dict.fromkeys(suggestions))}?")
         return None
     elif len(person_ids) > 1:
         print(f"Which '{name}'?")
@@ -146,6 +671,8 @@ def neighbors_for_person(person_id):
     Returns (movie_id, person_id) pairs for people
     who starred with a given person.
     """
+    if graph is not None:
+        return set(graph.path_ids(graph.neighbors(graph.person_index[person_id])))
     movie_ids = people[person_id]["movies"]
     neighbors = set()
     for movie_id in movie_ids:
@@ -154,5 +681,19 @@ def neighbors_for_person(person_id):
     return neighbors
 
 
+def unseen_neighbors(person_id, seen_movies):
+    """
+    Yields (movie_id, person_id) pairs for people who starred with a given
+    person in movies not yet in seen_movies, adding those movies to it.
+    A search sharing one seen_movies set scans every cast at most once.
+    """
+    for movie_id in people[person_id]["movies"]:
+        if movie_id in seen_movies:
+            continue
+        seen_movies.add(movie_id)
+        for person_id in movies[movie_id]["stars"]:
+            yield movie_id, person_id
+
+
 if __name__ == "__main__":
     main()
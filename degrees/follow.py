@@ -0,0 +1,75 @@
+import csv
+import os
+import threading
+
+import degrees
+
+# How each CSV's appended rows are applied, in the order they are polled
+APPLY = {
+    "people.csv": lambda row: degrees.add_person(row["id"], row["name"], row["birth"]),
+    "movies.csv": lambda row: degrees.add_movie(row["id"], row["title"], row["year"]),
+    "stars.csv": lambda row: degrees.add_star(row["person_id"], row["movie_id"]),
+}
+
+
+def read_appended(path, offset):
+    """
+    Returns (rows, offset) for the complete lines appended to a CSV since
+    offset, as dicts keyed by the header, and the offset after the last one.
+    """
+    with open(path, "rb") as f:
+        header = f.readline().decode("utf-8")
+        f.seek(offset)
+        data = f.read()
+    end = data.rfind(b"\n") + 1
+    if end == 0:
+        return [], offset
+    lines = data[:end].decode("utf-8").splitlines()
+    return list(csv.DictReader(lines, fieldnames=next(csv.reader([header])))), offset + end
+
+
+def poll(directory, offsets=degrees.loaded_sizes):
+    """
+    Apply rows appended to the CSVs since the offsets, advancing them.
+    Rows naming unknown or already known people and movies are skipped.
+    Returns the number of rows applied.
+    """
+    applied = 0
+    for name, apply in APPLY.items():
+        path = os.path.join(directory, name)
+        rows, offsets[name] = read_appended(path, offsets[name])
+        for row in rows:
+            try:
+                apply(row)
+                applied += 1
+            except (KeyError, ValueError):
+                pass
+    return applied
+
+
+def follow(directory, interval=1.0, stop=None):
+    """
+    Keep applying rows appended to the loaded CSVs every interval seconds
+    until the stop event is set.
+    """
+    stop = stop or threading.Event()
+    while not stop.is_set():
+        poll(directory)
+        stop.wait(interval)
+
+
+def follow_in_background(directory, interval=1.0):
+    """
+    Run follow on a daemon thread. Returns the event that stops it.
+    Only for data loaded with compact=True: CompactGraph patches whole rows
+    that searches can keep iterating, whereas in dict mode a search iterating
+    a person's movies or a movie's stars fails once a credit changes the set.
+    Queries running meanwhile may still see a partly applied poll.
+    """
+    if degrees.graph is None:
+        raise ValueError("following in the background needs data loaded with compact=True")
+    stop = threading.Event()
+    thread = threading.Thread(target=follow, args=(directory, interval, stop), daemon=True)
+    thread.start()
+    return stop
+
@@ -0,0 +1,244 @@
+from array import array
+
+# Typecode of every index and offset array, 32 bit is plenty for IMDb
+INDEX_TYPE = "i"
+# Arrays making up a CompactGraph, in constructor order
+ARRAYS = ("person_offsets", "person_movies", "movie_offsets", "movie_stars", "components")
+
+
+def zeros(count):
+    """
+    Returns an index array of count zeros.
+    """
+    return array(INDEX_TYPE, bytes(array(INDEX_TYPE).itemsize * count))
+
+
+class CompactGraph():
+    """
+    Person/movie adjacency in compressed sparse row form.
+
+    People and movies are numbered densely from 0. The movies of person p are
+    person_movies[person_offsets[p]:person_offsets[p + 1]] and the stars of
+    movie m are movie_stars[movie_offsets[m]:movie_offsets[m + 1]].
+    components[p] labels the connected component of person p.
+
+    The arrays are never modified. People, movies and credits changed at
+    runtime are kept as whole replacement rows in patched_movies and
+    patched_stars, which take precedence over the arrays.
+    """
+
+    def __init__(self, person_ids, movie_ids, person_offsets, person_movies, movie_offsets, movie_stars,
+                 components=None):
+        self.person_ids = person_ids
+        self.movie_ids = movie_ids
+        self.person_index = {person_id: i for i, person_id in enumerate(person_ids)}
+        self.movie_index = {movie_id: i for i, movie_id in enumerate(movie_ids)}
+        # Memoryviews so slicing never copies, whatever buffer backs the arrays
+        self.person_offsets = memoryview(person_offsets)
+        self.person_movies = memoryview(person_movies)
+        self.movie_offsets = memoryview(movie_offsets)
+        self.movie_stars = memoryview(movie_stars)
+        self.patched_movies = {}
+        self.patched_stars = {}
+        if components is None:
+            components = self.label_components()
+        self.components = memoryview(components)
+
+    @classmethod
+    def from_edges(cls, person_ids, movie_ids, edges, allocate=zeros):
+        """
+        Build a graph from a flat sequence of alternating person and movie
+        indexes, one pair per star credit. Duplicate credits are dropped.
+        The arrays sized by the number of credits come from allocate(count),
+        which returns count writable zeros like zeros does.
+        """
+        edges = memoryview(edges)
+        edge_people = edges[0::2]
+        edge_movies = edges[1::2]
+
+        # Counting sort the credits into unsorted person rows
+        offsets = zeros(len(person_ids) + 1)
+        for person in edge_people:
+            offsets[person + 1] += 1
+        for person in range(len(person_ids)):
+            offsets[person + 1] += offsets[person]
+        fill = array(INDEX_TYPE, offsets[:-1])
+        unsorted = allocate(len(edge_people))
+        for person, movie in zip(edge_people, edge_movies):
+            unsorted[fill[person]] = movie
+            fill[person] += 1
+        del fill
+
+        # Sort and deduplicate every person row
+        person_offsets = zeros(len(person_ids) + 1)
+        person_movies = allocate(len(edge_people))
+        end = 0
+        for person in range(len(person_ids)):
+            row = array(INDEX_TYPE, sorted(set(unsorted[offsets[person]:offsets[person + 1]])))
+            person_movies[end:end + len(row)] = row
+            end += len(row)
+            person_offsets[person + 1] = end
+        del unsorted, offsets
+        # Only as many as there were distinct credits
+        person_movies = memoryview(person_movies)[:end]
+
+        # Transpose into movie rows, which come out sorted by person
+        movie_offsets = zeros(len(movie_ids) + 1)
+        for movie in person_movies:
+            movie_offsets[movie + 1] += 1
+        for movie in range(len(movie_ids)):
+            movie_offsets[movie + 1] += movie_offsets[movie]
+        fill = array(INDEX_TYPE, movie_offsets[:-1])
+        movie_stars = allocate(end)
+        for person in range(len(person_ids)):
+            for movie in person_movies[person_offsets[person]:person_offsets[person + 1]]:
+                movie_stars[fill[movie]] = person
+                fill[movie] += 1
+
+        return cls(person_ids, movie_ids, person_offsets, person_movies, movie_offsets, movie_stars)
+
+    def movies_of(self, person):
+        """
+        Returns the movie indexes of a person.
+        """
+        row = self.patched_movies.get(person)
+        if row is not None:
+            return row
+        return self.person_movies[self.person_offsets[person]:self.person_offsets[person + 1]]
+
+    def stars_of(self, movie):
+        """
+        Returns the person indexes starring in a movie.
+        """
+        row = self.patched_stars.get(movie)
+        if row is not None:
+            return row
+        return self.movie_stars[self.movie_offsets[movie]:self.movie_offsets[movie + 1]]
+
+    def neighbors(self, person):
+        """
+        Yields (movie index, person index) pairs for people
+        who starred with a given person.
+        """
+        for movie in self.movies_of(person):
+            for star in self.stars_of(movie):
+                yield movie, star
+
+    def unseen_neighbors(self, person, seen_movies):
+        """
+        Like neighbors, but skips movies in seen_movies and adds the others to it,
+        so a search sharing one set scans every cast at most once.
+        """
+        for movie in self.movies_of(person):
+            if movie in seen_movies:
+                continue
+            seen_movies.add(movie)
+            for star in self.stars_of(movie):
+                yield movie, star
+
+    def label_components(self):
+        """
+        Returns an array labelling every person with the smallest person index
+        in their connected component, found with union-find over movie casts.
+        """
+        parents = array(INDEX_TYPE, range(len(self.person_ids)))
+
+        def find(person):
+            while parents[person] != person:
+                # Path halving keeps the trees shallow without recursion
+                parents[person] = parents[parents[person]]
+                person = parents[person]
+            return person
+
+        for movie in range(len(self.movie_ids)):
+            stars = self.stars_of(movie)
+            if len(stars) < 2:
+                continue
+            root = find(stars[0])
+            for star in stars[1:]:
+                other = find(star)
+                if other == root:
+                    continue
+                # Linking under the smaller index makes the final root the label
+                if other < root:
+                    root, other = other, root
+                parents[other] = root
+        for person in range(len(parents)):
+            parents[person] = find(person)
+        return parents
+
+    def connected(self, person, other):
+        """
+        Returns whether two people are in the same component, in O(1).
+        """
+        return self.components[person] == self.components[other]
+
+    def add_person(self, person_id):
+        """
+        Returns the index of a new person without movies.
+        """
+        person = len(self.person_ids)
+        self.person_ids.append(person_id)
+        self.person_index[person_id] = person
+        self.patched_movies[person] = []
+        return person
+
+    def add_movie(self, movie_id):
+        """
+        Returns the index of a new movie without stars.
+        """
+        movie = len(self.movie_ids)
+        self.movie_ids.append(movie_id)
+        self.movie_index[movie_id] = movie
+        self.patched_stars[movie] = []
+        return movie
+
+    def add_star(self, person, movie):
+        """
+        Add a credit, returns False if it already existed.
+        """
+        if person not in self.patched_movies:
+            self.patched_movies[person] = list(self.movies_of(person))
+        if movie in self.patched_movies[person]:
+            return False
+        if movie not in self.patched_stars:
+            self.patched_stars[movie] = list(self.stars_of(movie))
+        self.patched_movies[person].append(movie)
+        self.patched_stars[movie].append(person)
+        return True
+
+    def remove_star(self, person, movie):
+        """
+        Remove a credit, returns False if it did not exist.
+        """
+        if movie not in self.movies_of(person):
+            return False
+        if person not in self.patched_movies:
+            self.patched_movies[person] = list(self.movies_of(person))
+        if movie not in self.patched_stars:
+            self.patched_stars[movie] = list(self.stars_of(movie))
+        self.patched_movies[person].remove(movie)
+        self.patched_stars[movie].remove(person)
+        return True
+
+    def remove_person(self, person_id):
+        """
+        Remove a person and their credits. The index is left unused.
+        """
+        person = self.person_index.pop(person_id)
+        for movie in list(self.movies_of(person)):
+            self.remove_star(person, movie)
+
+    def remove_movie(self, movie_id):
+        """
+        Remove a movie and its credits. The index is left unused.
+        """
+        movie = self.movie_index.pop(movie_id)
+        for person in list(self.stars_of(movie)):
+            self.remove_star(person, movie)
+
+    def path_ids(self, path):
+        """
+        Translate a path of (movie index, person index) pairs back to IMDb ids.
+        """
+        return [(self.movie_ids[movie], self.person_ids[person]) for movie, person in path]
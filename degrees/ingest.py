@@ -0,0 +1,174 @@
+import csv
+import itertools
+import mmap
+import sys
+import tempfile
+import time
+from array import array
+
+from graph import ARRAYS, CompactGraph, INDEX_TYPE, zeros
+from metadata import MOVIE_FIELDS, PERSON_FIELDS, RecordPacker
+
+# Rows parsed between progress checks
+CHUNK_SIZE = 65536
+
+
+class Progress():
+    """
+    Reports rows read and rows per second for one CSV on stderr,
+    at most once per interval seconds.
+    """
+
+    def __init__(self, name, interval=1.0):
+        self.name = name
+        self.interval = interval
+        self.rows = 0
+        self.start = self.last = time.perf_counter()
+
+    def update(self, rows):
+        self.rows += rows
+        now = time.perf_counter()
+        if now - self.last >= self.interval:
+            self.report(now)
+            self.last = now
+
+    def done(self):
+        self.report(time.perf_counter())
+
+    def report(self, now):
+        rate = self.rows / max(now - self.start, 1e-9)
+        print(f"{self.name}: {self.rows} rows, {rate:.0f} rows/s", file=sys.stderr)
+
+
+def mapped_zeros(count):
+    """
+    Returns count index zeros in a memory mapped temporary file, pages the
+    kernel can write out and drop instead of keeping them in memory.
+    """
+    if count == 0:
+        return zeros(0)
+    with tempfile.TemporaryFile() as f:
+        f.truncate(count * zeros(0).itemsize)
+        mapped = mmap.mmap(f.fileno(), 0)
+    return memoryview(mapped).cast(INDEX_TYPE)
+
+
+class EdgeBuffer():
+    """
+    Flat buffer of alternating person and movie indexes. Up to spill_threshold
+    bytes are kept in memory, beyond that they spill to a temporary file
+    that is memory mapped back once ingestion is done.
+    """
+
+    def __init__(self, spill_threshold=None):
+        self.spill_threshold = spill_threshold
+        self.pairs = array(INDEX_TYPE)
+        self.spill = None
+
+    def append(self, person, movie):
+        self.pairs.append(person)
+        self.pairs.append(movie)
+
+    def check_spill(self):
+        if self.spill_threshold is not None and len(self.pairs) * self.pairs.itemsize >= self.spill_threshold:
+            if self.spill is None:
+                self.spill = tempfile.TemporaryFile()
+            self.pairs.tofile(self.spill)
+            del self.pairs[:]
+
+    def view(self):
+        """
+        Returns every buffered index as one memoryview.
+        """
+        if self.spill is None:
+            return memoryview(self.pairs)
+        self.pairs.tofile(self.spill)
+        del self.pairs[:]
+        self.spill.flush()
+        if self.spill.tell() == 0:
+            return memoryview(self.pairs)
+        return memoryview(mmap.mmap(self.spill.fileno(), 0, access=mmap.ACCESS_READ)).cast(INDEX_TYPE)
+
+
+def read_chunks(path, columns, chunk_size=CHUNK_SIZE, progress=False):
+    """
+    Yields lists of rows from a CSV, each row reduced to the given columns
+    in that order, chunk_size rows at a time.
+    """
+    with open(path, encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        positions = [header.index(column) for column in columns]
+        tracker = Progress(path) if progress else None
+        while True:
+            rows = list(itertools.islice(reader, chunk_size))
+            if not rows:
+                break
+            chunk = [[row[i] for i in positions] for row in rows if row]
+            if tracker is not None:
+                tracker.update(len(rows))
+            yield chunk
+        if tracker is not None:
+            tracker.done()
+
+
+def ingest(directory, chunk_size=CHUNK_SIZE, spill_threshold=None, progress=False):
+    """
+    Stream people.csv, movies.csv and stars.csv into the (metadata, arrays)
+    pair stored in snapshots: names and ids in metadata, packed records
+    and CompactGraph arrays in arrays.
+    spill_threshold bounds the bytes of star credits held in memory. Once the
+    credits of stars.csv exceed it, they and the CompactGraph arrays built
+    from them live in memory mapped temporary files instead. Ids, names and
+    records, which grow with people and movies rather than credits, stay in
+    memory either way.
+    """
+    names = {}
+    person_ids = []
+    person_index = {}
+    person_records = RecordPacker()
+    for chunk in read_chunks(f"{directory}/people.csv", ("id",) + PERSON_FIELDS, chunk_size, progress):
+        for person_id, name, birth in chunk:
+            if person_id in person_index:
+                continue
+            person_id = sys.intern(person_id)
+            person_index[person_id] = len(person_ids)
+            person_ids.append(person_id)
+            person_records.add((name, birth))
+            names.setdefault(name.lower(), set()).add(person_id)
+
+    movie_ids = []
+    movie_index = {}
+    movie_records = RecordPacker()
+    for chunk in read_chunks(f"{directory}/movies.csv", ("id",) + MOVIE_FIELDS, chunk_size, progress):
+        for movie_id, title, year in chunk:
+            if movie_id in movie_index:
+                continue
+            movie_id = sys.intern(movie_id)
+            movie_index[movie_id] = len(movie_ids)
+            movie_ids.append(movie_id)
+            movie_records.add((title, year))
+
+    edges = EdgeBuffer(spill_threshold)
+    for chunk in read_chunks(f"{directory}/stars.csv", ("person_id", "movie_id"), chunk_size, progress):
+        for person_id, movie_id in chunk:
+            person = person_index.get(person_id)
+            movie = movie_index.get(movie_id)
+            if person is not None and movie is not None:
+                edges.append(person, movie)
+        edges.check_spill()
+
+    start = time.perf_counter()
+    pairs = edges.view()
+    allocate = zeros if edges.spill is None else mapped_zeros
+    graph = CompactGraph.from_edges(person_ids, movie_ids, pairs, allocate)
+    if progress:
+        print(f"graph built in {time.perf_counter() - start:.2f}s", file=sys.stderr)
+
+    metadata = {"names": names, "person_ids": person_ids, "movie_ids": movie_ids}
+    arrays = {name: getattr(graph, name) for name in ARRAYS}
+    arrays["person_records"] = person_records.offsets
+    arrays["person_data"] = person_records.blob
+    arrays["movie_records"] = movie_records.offsets
+    arrays["movie_data"] = movie_records.blob
+    return metadata, arrays
@@ -0,0 +1,62 @@
+from array import array
+from collections.abc import Mapping
+
+# Separates the fields of one packed record
+SEPARATOR = "\0"
+PERSON_FIELDS = ("name", "birth")
+MOVIE_FIELDS = ("title", "year")
+
+
+class RecordPacker():
+    """
+    Packs records one at a time into a UTF-8 blob, where record i spans
+    blob[offsets[i]:offsets[i + 1]].
+    """
+
+    def __init__(self):
+        self.offsets = array("q", [0])
+        self.blob = bytearray()
+
+    def add(self, values):
+        self.blob += SEPARATOR.join(values).encode()
+        self.offsets.append(len(self.blob))
+
+
+class RecordTable(Mapping):
+    """
+    Mapping from ids to metadata dictionaries, decoded on access
+    from a packed blob, usually memory mapped from a snapshot.
+    The keys are those of index, which its owner may change; records
+    stored at runtime are kept in updates and take precedence over the blob.
+    """
+
+    def __init__(self, index, fields, offsets, blob):
+        # Maps ids to their position in offsets
+        self.index = index
+        self.fields = fields
+        self.offsets = offsets
+        self.blob = blob
+        self.updates = {}
+
+    def __setitem__(self, record_id, record):
+        self.updates[record_id] = {field: record[field] for field in self.fields}
+
+    def __delitem__(self, record_id):
+        self.updates.pop(record_id, None)
+
+    def __getitem__(self, record_id):
+        record = self.updates.get(record_id)
+        if record is not None:
+            return dict(record)
+        i = self.index[record_id]
+        data = bytes(self.blob[self.offsets[i]:self.offsets[i + 1]]).decode()
+        return dict(zip(self.fields, data.split(SEPARATOR)))
+
+    def __iter__(self):
+        return iter(self.index)
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, record_id):
+        return record_id in self.index
@@ -0,0 +1,148 @@
+import heapq
+from bisect import bisect_left, insort
+
+# Rank of each kind of match, best first
+EXACT, PREFIX, FUZZY = 0, 1, 2
+# Fuzzy candidates are scored with edit distance, at most this many per query
+FUZZY_CANDIDATES = 100
+# Names a prefix search ranks before keeping the closest, so very short
+# queries do not rank every name they prefix
+PREFIX_CANDIDATES = 1000
+# Trigrams shared by more names than this are too common to narrow a search
+COMMON_TRIGRAM = 2000
+
+
+def trigrams(name):
+    """
+    Returns the set of 3 character substrings of a padded name.
+    """
+    padded = f"  {name} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a, b, limit):
+    """
+    Returns the Levenshtein distance between a and b,
+    or limit + 1 as soon as it is known to exceed limit.
+    Only the band of cells within limit of the diagonal is computed.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    over = limit + 1
+    previous = [min(j, over) for j in range(len(b) + 1)]
+    for i, char in enumerate(a, start=1):
+        current = [over] * (len(b) + 1)
+        current[0] = min(i, over)
+        row_min = current[0]
+        for j in range(max(1, i - limit), min(len(b), i + limit) + 1):
+            cost = previous[j - 1] + (char != b[j - 1])
+            if previous[j] + 1 < cost:
+                cost = previous[j] + 1
+            if current[j - 1] + 1 < cost:
+                cost = current[j - 1] + 1
+            current[j] = cost
+            if cost < row_min:
+                row_min = cost
+        if row_min > limit:
+            return over
+        previous = current
+    return min(previous[-1], over)
+
+
+class NameIndex():
+    """
+    Prefix and typo tolerant lookup over lowercased names.
+    Names are kept sorted for prefix ranges and indexed by trigram
+    to find candidates for edit distance ranking.
+    """
+
+    def __init__(self, names=()):
+        self.sorted_names = sorted(names)
+        # Maps each trigram to the set of names containing it
+        self.postings = {}
+        for name in self.sorted_names:
+            for gram in trigrams(name):
+                self.postings.setdefault(gram, set()).add(name)
+
+    def add(self, name):
+        i = bisect_left(self.sorted_names, name)
+        if i < len(self.sorted_names) and self.sorted_names[i] == name:
+            return
+        insort(self.sorted_names, name)
+        for gram in trigrams(name):
+            self.postings.setdefault(gram, set()).add(name)
+
+    def remove(self, name):
+        i = bisect_left(self.sorted_names, name)
+        if i == len(self.sorted_names) or self.sorted_names[i] != name:
+            return
+        del self.sorted_names[i]
+        for gram in trigrams(name):
+            self.postings[gram].discard(name)
+
+    def prefixed(self, prefix, limit):
+        """
+        Returns up to limit names starting with prefix, in order.
+        """
+        rs = []
+        i = bisect_left(self.sorted_names, prefix)
+        while i < len(self.sorted_names) and len(rs) < limit and self.sorted_names[i].startswith(prefix):
+            rs.append(self.sorted_names[i])
+            i += 1
+        return rs
+
+    def similar(self, query, limit, max_distance):
+        """
+        Returns up to limit (distance, name) pairs within max_distance edits
+        of query, closest first.
+        """
+        # Only the rarer half of the query's trigrams some name has is looked
+        # up, and common ones not at all, they would mostly add candidates
+        # that fail the distance check anyway
+        grams = sorted((gram for gram in trigrams(query) if self.postings.get(gram)),
+                       key=lambda gram: len(self.postings[gram]))
+        grams = grams[:len(grams) // 2 + 1]
+        rare = [gram for gram in grams if len(self.postings[gram]) <= COMMON_TRIGRAM]
+        shared = {}
+        for gram in rare or grams[:1]:
+            for name in self.postings.get(gram, ()):
+                shared[name] = shared.get(name, 0) + 1
+        # Names more than max_distance longer or shorter can never match
+        candidates = heapq.nlargest(
+            FUZZY_CANDIDATES,
+            (name for name in shared if abs(len(name) - len(query)) <= max_distance),
+            key=shared.get,
+        )
+        rs = []
+        for name in candidates:
+            distance = edit_distance(query, name, max_distance)
+            if distance <= max_distance:
+                rs.append((distance, name))
+                rs.sort()
+                # Once limit names are found, only closer ones can change the result
+                if len(rs) >= limit:
+                    del rs[limit:]
+                    max_distance = rs[-1][0]
+        return rs
+
+    def search(self, query, limit=10, max_distance=2):
+        """
+        Returns up to limit (rank, distance, name) matches for a lowercased
+        query: the exact name, then names it prefixes, then names within
+        max_distance edits.
+        """
+        rs = []
+        seen = set()
+        for name in self.prefixed(query, PREFIX_CANDIDATES):
+            rank = EXACT if name == query else PREFIX
+            rs.append((rank, 0 if rank == EXACT else len(name) - len(query), name))
+            seen.add(name)
+        # Shortest completions first, not the first ones in sorted order
+        rs.sort()
+        if len(rs) >= limit:
+            return rs[:limit]
+        for distance, name in self.similar(query, limit, max_distance):
+            if name not in seen:
+                rs.append((FUZZY, distance, name))
+        rs.sort()
+        return rs[:limit]
@@ -0,0 +1,103 @@
+import heapq
+import itertools
+
+
+def shortest_path_dag(source, target, neighbors_of):
+    """
+    Layered breadth first search from source up to the layer of target.
+    Returns (dag, depths) where dag maps every person on some shortest path
+    to target, other than source, to all of their (movie, parent) steps one
+    layer closer to source, or None if target is not reachable.
+    """
+    depths = {source: 0}
+    # Every (movie, parent) step reaching a person from the previous layer
+    steps = {}
+    layer = [source]
+    depth = 0
+    while layer and target not in depths:
+        depth += 1
+        next_layer = []
+        for person in layer:
+            for movie, neighbor in neighbors_of(person):
+                neighbor_depth = depths.get(neighbor)
+                if neighbor_depth is None:
+                    depths[neighbor] = depth
+                    steps[neighbor] = [(movie, person)]
+                    next_layer.append(neighbor)
+                elif neighbor_depth == depth:
+                    steps[neighbor].append((movie, person))
+        layer = next_layer
+    if target not in depths:
+        return None
+
+    # Keep only the people target can be reached through
+    dag = {}
+    stack = [target]
+    while stack:
+        person = stack.pop()
+        if person == source or person in dag:
+            continue
+        dag[person] = steps[person]
+        stack.extend(parent for _, parent in steps[person])
+    return dag, depths
+
+
+def unlink(suffix):
+    """
+    Turn a linked (movie, person, rest) suffix into a path list.
+    """
+    rs = []
+    while suffix is not None:
+        movie, person, suffix = suffix
+        rs.append((movie, person))
+    return rs
+
+
+def enumerate_paths(source, target, dag, limit):
+    """
+    Yields up to limit paths from source to target through the dag, depth first,
+    sharing path suffixes so only the paths being built are held in memory.
+    """
+    count = 0
+    stack = [(target, None)]
+    while stack and count < limit:
+        person, suffix = stack.pop()
+        if person == source:
+            yield unlink(suffix)
+            count += 1
+            continue
+        for movie, parent in dag[person]:
+            stack.append((parent, (movie, person, suffix)))
+
+
+def ranked_paths(source, target, dag, depths, limit, cost):
+    """
+    Yields up to limit paths from source to target through the dag in order of
+    increasing total cost(movie) over their movies.
+    Exact cheapest costs from source guide a best first search backwards from
+    target, so every popped complete path is the next cheapest.
+    """
+    costs = {}
+
+    def movie_cost(movie):
+        if movie not in costs:
+            costs[movie] = cost(movie)
+        return costs[movie]
+
+    best = {source: 0}
+    for person in sorted(dag, key=depths.get):
+        best[person] = min(best[parent] + movie_cost(movie) for movie, parent in dag[person])
+
+    count = 0
+    tie = itertools.count()
+    heap = [(best[target], next(tie), target, None)]
+    while heap and count < limit:
+        total, _, person, suffix = heapq.heappop(heap)
+        if person == source:
+            yield unlink(suffix)
+            count += 1
+            continue
+        suffix_cost = total - best[person]
+        for movie, parent in dag[person]:
+            heapq.heappush(heap, (best[parent] + movie_cost(movie) + suffix_cost, next(tie),
+                                  parent, (movie, person, suffix)))
@@ -0,0 +1,125 @@
+import json
+import time
+from collections import Counter, deque
+
+# Per query measurements aggregated into histograms, seconds are bucketed in microseconds
+METRICS = ("nodes_expanded", "edges_scanned", "peak_frontier",
+           "neighbor_seconds", "bookkeeping_seconds", "latency_seconds")
+
+
+def bucket(value):
+    """
+    Returns the lower end of the power of two bucket holding a non negative int.
+    """
+    return 1 << (value.bit_length() - 1) if value > 0 else 0
+
+
+def bucket_label(low):
+    return f"{low}-{max(low * 2 - 1, low)}"
+
+
+class QueryProbe():
+    """
+    Measures the work of one query through the neighbors function it wraps:
+    people expanded, co-stars scanned, the peak number of reached people
+    not yet expanded, and time spent producing neighbors. The probe's own
+    overhead is counted as bookkeeping.
+    """
+
+    def __init__(self, source, target):
+        self.source = source
+        self.target = target
+        self.nodes_expanded = 0
+        self.edges_scanned = 0
+        self.peak_frontier = 0
+        self.neighbor_seconds = 0.0
+        self.reached = set()
+        self.start = time.perf_counter()
+
+    def wrap(self, neighbors_of):
+        """
+        Returns a neighbors_of(person, seen_movies) that measures neighbors_of.
+        """
+        clock = time.perf_counter
+
+        def probed(person, seen_movies):
+            self.nodes_expanded += 1
+            self.reached.add(person)
+            start = clock()
+            for pair in neighbors_of(person, seen_movies):
+                self.neighbor_seconds += clock() - start
+                self.edges_scanned += 1
+                self.reached.add(pair[1])
+                frontier = len(self.reached) - self.nodes_expanded
+                if frontier > self.peak_frontier:
+                    self.peak_frontier = frontier
+                yield pair
+                start = clock()
+            self.neighbor_seconds += clock() - start
+
+        return probed
+
+
+class Profiler():
+    """
+    Collects a record per profiled query, keeping the latest keep of them,
+    and power of two histograms of every metric over all queries.
+    sink, if given, is called with every record as it is made.
+    """
+
+    def __init__(self, keep=10000, sink=None):
+        self.records = deque(maxlen=keep)
+        self.histograms = {metric: Counter() for metric in METRICS}
+        self.sink = sink
+        self.queries = 0
+
+    def start(self, source, target):
+        return QueryProbe(source, target)
+
+    def finish(self, probe, path, cached=False, exceeded=False):
+        """
+        Record a finished query. Returns the record.
+        """
+        latency = time.perf_counter() - probe.start
+        record = {
+            "source": probe.source,
+            "target": probe.target,
+            "degrees": None if path is None else len(path),
+            "cached": cached,
+            "budget_exceeded": exceeded,
+            "nodes_expanded": probe.nodes_expanded,
+            "edges_scanned": probe.edges_scanned,
+            "peak_frontier": probe.peak_frontier,
+            "neighbor_seconds": probe.neighbor_seconds,
+            "bookkeeping_seconds": max(latency - probe.neighbor_seconds, 0.0),
+            "latency_seconds": latency,
+        }
+        self.queries += 1
+        self.records.append(record)
+        for metric, counts in self.histograms.items():
+            value = record[metric]
+            if metric.endswith("_seconds"):
+                value = int(value * 1e6)
+            counts[bucket(value)] += 1
+        if self.sink is not None:
+            self.sink(record)
+        return record
+
+    def summary(self):
+        """
+        Returns the query count and every histogram, keyed by "low-high" bucket labels.
+        """
+        rs = {"queries": self.queries}
+        for metric, counts in self.histograms.items():
+            name = metric.replace("_seconds", "_us") if metric.endswith("_seconds") else metric
+            rs[name] = {bucket_label(low): counts[low] for low in sorted(counts)}
+        return rs
+
+
+def json_lines(f):
+    """
+    Returns a Profiler sink writing each record to f as a line of JSON.
+    """
+    def write(record):
+        f.write(json.dumps(record) + "\n")
+    return write
@@ -0,0 +1,284 @@
+import argparse
+import asyncio
+import concurrent.futures
+import gc
+import json
+import multiprocessing
+import os
+import sys
+import time
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+
+import batch
+import degrees
+from budget import BudgetExceeded
+
+# Largest request body accepted, in bytes
+MAX_BODY = 1 << 20
+# Most pairs accepted by one POST /batch
+MAX_PAIRS = 10000
+# Pairs of a POST /batch resolved or searched by one worker at a time
+BATCH_CHUNK = 250
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def path_record(source, target, deadline):
+    """
+    Worker side of GET /path. Names are resolved here, as a name that is
+    not found costs a fuzzy search for suggestions. A search still running
+    at deadline stops with the lower bound it reached instead of holding on
+    to the worker.
+    """
+    source_id, error = batch.resolve_person(source)
+    if error is None:
+        target_id, error = batch.resolve_person(target)
+    if error is not None:
+        return {"error": error}
+    path = degrees.shortest_path(source_id, target_id, deadline=deadline)
+    if isinstance(path, BudgetExceeded):
+        return {"source": source_id, "target": target_id, "degrees": None, "path": None,
+                "lower_bound": path.lower_bound}
+    return {"source": source_id, "target": target_id, "degrees": None if path is None else len(path), "path": path}
+
+
+def group_records(groups, deadline):
+    """
+    Worker side of POST /batch: the records of (source_id, queries) groups.
+    """
+    return [record for source_id, queries in groups for record in batch.run_group(source_id, queries, deadline)]
+
+
+def matching_people(name, limit):
+    """
+    Worker side of GET /search.
+    """
+    return degrees.search_people(name, limit)
+
+
+class QueryServer():
+    """
+    HTTP/JSON front end to the loaded data. Searches run on a forked process
+    pool so the event loop only parses requests and writes responses.
+    At most max_concurrent searches are queued or running at once, of which
+    one request holds at most half the workers' worth, so a big batch
+    leaves room for other clients. A request waiting longer than timeout
+    seconds for its searches gets a 504.
+    A search that timed out keeps its slot until its worker is done with it,
+    so a backlog of abandoned searches cannot pile up on the pool, and path
+    and batch searches stop themselves at the same deadline.
+    """
+
+    def __init__(self, workers=os.cpu_count(), max_concurrent=None, timeout=10.0):
+        self.workers = workers
+        self.slots = asyncio.Semaphore(max_concurrent or 2 * workers)
+        self.slots_per_request = max(1, workers // 2)
+        self.timeout = timeout
+        self.pool = None
+        self.routes = {
+            ("GET", "/path"): self.path,
+            ("GET", "/search"): self.search,
+            ("POST", "/batch"): self.batch,
+        }
+
+    def start_pool(self):
+        """
+        Fork the workers, which inherit the loaded data copy-on-write.
+        Call before serving, while the process has a single thread.
+        """
+        # As in batch.execute, frozen objects stay out of the collector and unshared pages
+        gc.freeze()
+        self.pool = concurrent.futures.ProcessPoolExecutor(self.workers, multiprocessing.get_context("fork"))
+        # The fork context starts every worker on the first submit
+        self.pool.submit(int).result()
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+        gc.unfreeze()
+
+    async def offload(self, function, *args):
+        """
+        Run function(*args) on the pool once a concurrency slot is free.
+        """
+        await self.slots.acquire()
+        try:
+            future = asyncio.get_running_loop().run_in_executor(self.pool, function, *args)
+        except BaseException:
+            self.slots.release()
+            raise
+        future.add_done_callback(lambda _: self.slots.release())
+        # Shielded so a timeout abandons the search without freeing its slot early
+        return await asyncio.shield(future)
+
+    async def offload_all(self, calls):
+        """
+        Run every (function, *args) call with offload, holding at most
+        slots_per_request slots at once. Returns the results in order.
+        """
+        limit = asyncio.Semaphore(self.slots_per_request)
+
+        async def run(call):
+            async with limit:
+                return await self.offload(*call)
+
+        return await asyncio.gather(*(run(call) for call in calls))
+
+    async def path(self, query, body):
+        source = required(query, "source")
+        target = required(query, "target")
+        record = await self.offload(path_record, source, target, time.monotonic() + self.timeout)
+        if "error" in record:
+            raise HTTPError(HTTPStatus.NOT_FOUND, record["error"])
+        return record
+
+    async def search(self, query, body):
+        name = required(query, "name")
+        try:
+            limit = int(query.get("limit", ["10"])[0])
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "limit must be an integer")
+        return await self.offload(matching_people, name, max(1, min(limit, 100)))
+
+    async def batch(self, query, body):
+        """
+        Answer {"pairs": [[source, target], ...]} with a record per pair in
+        order, like batch.py, sharing one search between pairs with a source.
+        As for GET /path, targets not reached by the deadline get a lower bound.
+        """
+        deadline = time.monotonic() + self.timeout
+        try:
+            pairs = json.loads(body)["pairs"]
+            pairs = [(number, str(source), str(target))
+                     for number, (source, target) in enumerate(pairs, start=1)]
+        except (ValueError, KeyError, TypeError):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, 'expected {"pairs": [[source, target], ...]}')
+        if len(pairs) > MAX_PAIRS:
+            raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f"at most {MAX_PAIRS} pairs per batch")
+        # Resolving names can take fuzzy searches too, so it runs on the pool in chunks
+        resolved = await self.offload_all([(batch.group_by_source, pairs[i:i + BATCH_CHUNK])
+                                           for i in range(0, len(pairs), BATCH_CHUNK)])
+        groups, errors = {}, []
+        for chunk_groups, chunk_errors in resolved:
+            for source_id, queries in chunk_groups.items():
+                groups.setdefault(source_id, []).extend(queries)
+            errors += chunk_errors
+        # Whole groups, about BATCH_CHUNK pairs per call
+        chunks = [[]]
+        size = 0
+        for group in groups.items():
+            if size >= BATCH_CHUNK:
+                chunks.append([])
+                size = 0
+            chunks[-1].append(group)
+            size += len(group[1])
+        results = await self.offload_all([(group_records, chunk, deadline) for chunk in chunks if chunk])
+        records = errors + [record for records in results for record in records]
+        records.sort(key=lambda record: record["line"])
+        return records
+
+    async def handle(self, reader, writer):
+        """
+        Answer one request per connection.
+        """
+        try:
+            try:
+                method, target, body = await asyncio.wait_for(read_request(reader), self.timeout)
+                url = urlsplit(target)
+                route = self.routes.get((method, url.path))
+                if route is None:
+                    raise HTTPError(HTTPStatus.NOT_FOUND, f"no route for {method} {url.path}")
+                result = await asyncio.wait_for(route(parse_qs(url.query), body), self.timeout)
+                status = HTTPStatus.OK
+            except HTTPError as e:
+                status, result = e.status, {"error": str(e)}
+            except asyncio.TimeoutError:
+                status, result = HTTPStatus.GATEWAY_TIMEOUT, {"error": f"no answer within {self.timeout}s"}
+            except Exception as e:
+                status, result = HTTPStatus.INTERNAL_SERVER_ERROR, {"error": repr(e)}
+            await write_response(writer, status, result)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host="127.0.0.1", port=8000):
+        server = await asyncio.start_server(self.handle, host, port)
+        print(f"Serving on http://{host}:{port}", file=sys.stderr)
+        async with server:
+            await server.serve_forever()
+
+
+def required(query, name):
+    values = query.get(name)
+    if not values or not values[0].strip():
+        raise HTTPError(HTTPStatus.BAD_REQUEST, f"missing {name} parameter")
+    return values[0].strip()
+
+
+async def read_request(reader):
+    """
+    Returns (method, target, body) of an HTTP/1.x request.
+    """
+    request_line = (await reader.readline()).decode("latin-1").split()
+    if len(request_line) != 3:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "malformed request line")
+    method, target, _ = request_line
+    headers = {}
+    while True:
+        line = (await reader.readline()).decode("latin-1")
+        if line in ("\r\n", "\n", ""):
+            break
+        name, _, value = line.partition(":")
+        headers[name.strip().lower()] = value.strip()
+    try:
+        length = int(headers.get("content-length", 0))
+    except ValueError:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "malformed Content-Length")
+    if length > MAX_BODY:
+        raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f"body over {MAX_BODY} bytes")
+    body = await reader.readexactly(length) if length > 0 else b""
+    return method, target, body
+
+
+async def write_response(writer, status, result):
+    body = json.dumps(result).encode("utf-8")
+    head = (f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+            "Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            "Connection: close\r\n\r\n")
+    writer.write(head.encode("latin-1") + body)
+    await writer.drain()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve degrees queries over HTTP.")
+    parser.add_argument("directory", nargs="?", default="large")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--max-concurrent", type=int, help="searches queued or running at once")
+    parser.add_argument("--timeout", type=float, default=10.0, help="seconds before a request gets a 504")
+    args = parser.parse_args()
+
+    print("Loading data...", file=sys.stderr)
+    degrees.load_data(args.directory, compact=True, index_names=True)
+    print("Data loaded.", file=sys.stderr)
+
+    server = QueryServer(args.workers, args.max_concurrent, args.timeout)
+    server.start_pool()
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+import json
+import mmap
+import os
+import pickle
+import struct
+
+MAGIC = b"DEGREES\0"
+# Bump whenever the layout below changes so stale snapshots are ignored
+VERSION = 3
+# Magic, version, length of the JSON header that follows
+PREAMBLE = struct.Struct("<8sII")
+ALIGNMENT = 8
+SOURCES = ("people.csv", "movies.csv", "stars.csv")
+
+
+def snapshot_path(directory):
+    return os.path.join(directory, "degrees.snapshot")
+
+
+def fingerprint(directory):
+    """
+    Returns the size and modification time of every source CSV,
+    so a snapshot is only reused while the CSVs are unchanged.
+    """
+    rs = {}
+    for name in SOURCES:
+        stat = os.stat(os.path.join(directory, name))
+        rs[name] = [stat.st_size, stat.st_mtime_ns]
+    return rs
+
+
+def write_snapshot(directory, metadata, arrays, sources):
+    """
+    Write metadata (any picklable object) and a dict of named arrays
+    (anything exposing the buffer protocol) to the snapshot file.
+    Arrays are stored raw and aligned so they can be memory mapped back.
+    sources is the fingerprint of the CSVs taken before they were read, so
+    rows appended while they were being read invalidate the snapshot.
+    """
+    sections = {"metadata": memoryview(pickle.dumps(metadata, protocol=pickle.HIGHEST_PROTOCOL))}
+    for name, data in arrays.items():
+        sections[name] = memoryview(data)
+
+    header = {"fingerprint": sources, "sections": {}}
+    offset = 0
+    for name, data in sections.items():
+        header["sections"][name] = [offset, data.nbytes, data.format]
+        offset += data.nbytes + -data.nbytes % ALIGNMENT
+    encoded_header = json.dumps(header).encode()
+    start = PREAMBLE.size + len(encoded_header)
+    start += -start % ALIGNMENT
+
+    # Write to a temporary file first so readers never see a partial snapshot
+    path = snapshot_path(directory)
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "wb") as f:
+        f.write(PREAMBLE.pack(MAGIC, VERSION, len(encoded_header)))
+        f.write(encoded_header)
+        for name, data in sections.items():
+            f.seek(start + header["sections"][name][0])
+            f.write(data)
+    os.replace(temporary, path)
+
+
+def read_snapshot(directory):
+    """
+    Returns (metadata, arrays) from the snapshot file, or None if there is
+    no usable snapshot for the current CSVs.
+    Arrays are memoryviews straight into the memory mapped file, so every
+    process mapping the same snapshot shares its pages.
+    """
+    try:
+        with open(snapshot_path(directory), "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    try:
+        magic, version, header_length = PREAMBLE.unpack_from(mapped)
+    except struct.error:
+        return None
+    if magic != MAGIC or version != VERSION:
+        return None
+    # A damaged header or body only costs the faster load, like a missing snapshot
+    try:
+        header = json.loads(mapped[PREAMBLE.size:PREAMBLE.size + header_length])
+        if header["fingerprint"] != fingerprint(directory):
+            return None
+        start = PREAMBLE.size + header_length
+        start += -start % ALIGNMENT
+
+        view = memoryview(mapped)
+        arrays = {}
+        for name, (offset, length, data_format) in header["sections"].items():
+            if start + offset + length > len(view):
+                return None
+            arrays[name] = view[start + offset:start + offset + length].cast(data_format)
+        metadata = pickle.loads(arrays.pop("metadata"))
+    except (ValueError, KeyError, TypeError, EOFError, pickle.UnpicklingError):
+        return None
+    return metadata, arrays
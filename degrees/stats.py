@@ -0,0 +1,203 @@
+import argparse
+import heapq
+import json
+import random
+import sys
+import time
+from array import array
+from collections import Counter
+
+import degrees
+from graph import INDEX_TYPE
+from profiling import bucket, bucket_label
+
+# Distance of people a sweep has not reached
+UNREACHED = -1
+
+
+def histogram(values):
+    """
+    Count values into power of two buckets labelled "low-high".
+    """
+    buckets = Counter(map(bucket, values))
+    return {bucket_label(low): buckets[low] for low in sorted(buckets)}
+
+
+def percentiles(values, points=(50, 90, 99, 100)):
+    ordered = sorted(values)
+    if not ordered:
+        return {}
+    return {f"p{point}": ordered[min(len(ordered) - 1, len(ordered) * point // 100)] for point in points}
+
+
+def row_lengths(offsets):
+    return [offsets[i + 1] - offsets[i] for i in range(len(offsets) - 1)]
+
+
+def co_star_degree(graph, person):
+    """
+    Returns the number of distinct people who starred with a person.
+    """
+    co_stars = set()
+    for movie in graph.movies_of(person):
+        co_stars.update(graph.stars_of(movie))
+    co_stars.discard(person)
+    return len(co_stars)
+
+
+def sweep(graph, root):
+    """
+    Breadth first search from root.
+    Returns (farthest person, eccentricity of root, people reached).
+    """
+    distances = array(INDEX_TYPE, [UNREACHED]) * len(graph.person_ids)
+    distances[root] = 0
+    seen_movies = set()
+    layer = [root]
+    depth = 0
+    farthest = root
+    reached = 1
+    while layer:
+        next_layer = []
+        for person in layer:
+            for _, star in graph.unseen_neighbors(person, seen_movies):
+                if distances[star] == UNREACHED:
+                    distances[star] = depth + 1
+                    next_layer.append(star)
+        if next_layer:
+            depth += 1
+            farthest = next_layer[0]
+            reached += len(next_layer)
+        layer = next_layer
+    return farthest, depth, reached
+
+
+def component_report(graph):
+    people = [person for person in range(len(graph.person_ids)) if graph.person_ids[person] in graph.person_index]
+    sizes = Counter(degrees.component_of(graph.person_ids[person]) for person in people)
+    ordered = sorted(sizes.values(), reverse=True)
+    return {
+        "count": len(sizes),
+        "largest": ordered[:10],
+        "singletons": sum(1 for size in ordered if size == 1),
+        "histogram": histogram(ordered),
+    }, sizes.most_common(1)[0][0] if sizes else None
+
+
+def diameter_report(graph, label, sweeps, rng):
+    """
+    Estimate eccentricities and the diameter of the component with the given
+    label by double sweeps: a search from a random person finds a far person,
+    whose eccentricity is a lower bound on the diameter.
+    """
+    members = [person for person in range(len(graph.person_ids))
+               if graph.person_ids[person] in graph.person_index
+               and degrees.component_of(graph.person_ids[person]) == label]
+    eccentricities = []
+    lower = 0
+    upper = None
+    for _ in range(sweeps):
+        start = rng.choice(members)
+        far, eccentricity, _ = sweep(graph, start)
+        eccentricities.append(eccentricity)
+        upper = 2 * eccentricity if upper is None else min(upper, 2 * eccentricity)
+        _, far_eccentricity, _ = sweep(graph, far)
+        eccentricities.append(far_eccentricity)
+        lower = max(lower, far_eccentricity)
+    return {
+        "component_size": len(members),
+        "diameter_lower_bound": lower,
+        "diameter_upper_bound": upper,
+        "sampled_eccentricities": percentiles(eccentricities, (0, 50, 100)),
+    }
+
+
+def build_report(samples=10000, sweeps=4, seed=0):
+    """
+    Returns the analytics report for the loaded compact graph as a dict.
+    Co-star degrees are computed for a sample of people unless samples is None.
+    """
+    graph = degrees.graph
+    rng = random.Random(seed)
+    timings = {}
+    report = {}
+
+    start = time.perf_counter()
+    movies_per_person = row_lengths(graph.person_offsets)
+    cast_sizes = row_lengths(graph.movie_offsets)
+    # Stars scanned by one neighbors_for_person call, the real cost of expanding a person
+    expansion_costs = [
+        sum(cast_sizes[movie] for movie in graph.movies_of(person)) for person in range(len(graph.person_ids))
+    ]
+    report["totals"] = {
+        "people": len(graph.person_index),
+        "movies": len(graph.movie_index),
+        "credits": len(graph.person_movies),
+    }
+    report["movies_per_person"] = {**percentiles(movies_per_person), "histogram": histogram(movies_per_person)}
+    largest = heapq.nlargest(10, range(len(cast_sizes)), key=cast_sizes.__getitem__)
+    report["cast_sizes"] = {
+        **percentiles(cast_sizes),
+        "histogram": histogram(cast_sizes),
+        "largest": [{"id": graph.movie_ids[movie], "stars": cast_sizes[movie]} for movie in largest],
+    }
+    costliest = heapq.nlargest(10, range(len(expansion_costs)), key=expansion_costs.__getitem__)
+    report["expansion_cost"] = {
+        **percentiles(expansion_costs),
+        "costliest": [{"id": graph.person_ids[person], "stars_scanned": expansion_costs[person]}
+                      for person in costliest],
+    }
+    timings["degrees"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    people = range(len(graph.person_ids))
+    if samples is not None and samples < len(people):
+        people = rng.sample(people, samples)
+    co_star_degrees = {person: co_star_degree(graph, person) for person in people}
+    top = heapq.nlargest(10, co_star_degrees, key=co_star_degrees.get)
+    report["co_star_degree"] = {
+        "sampled": len(co_star_degrees),
+        **percentiles(co_star_degrees.values()),
+        "histogram": histogram(co_star_degrees.values()),
+        "top": [{"id": graph.person_ids[person], "co_stars": co_star_degrees[person]} for person in top],
+    }
+    timings["co_star_degree"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    report["components"], largest_label = component_report(graph)
+    timings["components"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    if largest_label is not None and sweeps:
+        report["diameter"] = diameter_report(graph, largest_label, sweeps, rng)
+    timings["diameter"] = time.perf_counter() - start
+
+    report["seconds"] = timings
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Graph statistics for a degrees dataset.")
+    parser.add_argument("directory", nargs="?", default="large")
+    parser.add_argument("report", nargs="?", help="JSON file to write, stdout if omitted")
+    parser.add_argument("--samples", type=int, default=10000,
+                        help="people to compute co-star degrees for, 0 for everyone")
+    parser.add_argument("--sweeps", type=int, default=4, help="double sweeps for the diameter estimate")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print("Loading data...", file=sys.stderr)
+    degrees.load_data(args.directory, compact=True)
+    print("Data loaded.", file=sys.stderr)
+
+    report = build_report(args.samples or None, args.sweeps, args.seed)
+    if args.report is None:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,398 @@
+import io
+import itertools
+import json
+import mmap
+import os
+import random
+import shutil
+import tempfile
+import time
+from unittest import TestCase, main
+
+import batch
+import degrees
+import follow
+from budget import BudgetExceeded
+from cache import PathCache
+from snapshot import read_snapshot, snapshot_path
+
+SMALL = os.path.join(os.path.dirname(os.path.abspath(__file__)), "small")
+
+KEVIN_BACON, TOM_HANKS, ROBIN_WRIGHT, CARY_ELWES, EMMA_WATSON = "102", "158", "705", "144", "914612"
+APOLLO_13 = "112384"
+
+
+def load(directory, compact=False, use_snapshot=True, **options):
+    """
+    load_data into freshly reset module state.
+    """
+    degrees.names.clear()
+    degrees.people = {}
+    degrees.movies = {}
+    degrees.components.clear()
+    degrees.merged_components.clear()
+    degrees.graph = None
+    degrees.name_index = None
+    degrees.path_cache = None
+    degrees.landmarks = None
+    degrees.profiler = None
+    degrees.load_data(directory, compact, use_snapshot, **options)
+
+
+def write_graph(directory, people, movies, cast, seed=0):
+    """
+    Write CSVs of people p0, p1, ... and movies m0, m1, ... each starring
+    cast people picked at random.
+    """
+    rng = random.Random(seed)
+    os.makedirs(directory)
+    with open(os.path.join(directory, "people.csv"), "w") as f:
+        f.write("id,name,birth\n")
+        f.writelines(f'p{i},"Person {i}",{1950 + i % 50}\n' for i in range(people))
+    with open(os.path.join(directory, "movies.csv"), "w") as f:
+        f.write("id,title,year\n")
+        f.writelines(f'm{i},"Movie {i}",{1980 + i % 40}\n' for i in range(movies))
+    with open(os.path.join(directory, "stars.csv"), "w") as f:
+        f.write("person_id,movie_id\n")
+        for i in range(movies):
+            f.writelines(f"p{person},m{i}\n" for person in rng.sample(range(people), cast))
+
+
+class Degrees(TestCase):
+    def setUp(self):
+        # Snapshots are written next to the CSVs, so work on a copy
+        self.directory = os.path.join(tempfile.mkdtemp(), "small")
+        shutil.copytree(SMALL, self.directory, ignore=shutil.ignore_patterns("degrees.snapshot"))
+
+    def tearDown(self):
+        shutil.rmtree(os.path.dirname(self.directory))
+
+    def assertValidPath(self, source, target, path):
+        person_id = source
+        for movie_id, next_id in path:
+            self.assertIn((movie_id, next_id), degrees.neighbors_for_person(person_id))
+            person_id = next_id
+        self.assertEqual(target, person_id)
+
+    def all_paths(self, bidirectional=False):
+        people = sorted(degrees.people)
+        return {(source, target): degrees.shortest_path(source, target, bidirectional)
+                for source, target in itertools.product(people, people)}
+
+    def test_bidirectional(self):
+        load(self.directory)
+        one_sided = self.all_paths()
+        both_sided = self.all_paths(bidirectional=True)
+        for (source, target), path in one_sided.items():
+            other = both_sided[source, target]
+            if path is None:
+                self.assertIsNone(other)
+                continue
+            self.assertEqual(len(path), len(other))
+            self.assertValidPath(source, target, path)
+            self.assertValidPath(source, target, other)
+        self.assertEqual(1, len(one_sided[KEVIN_BACON, TOM_HANKS]))
+        self.assertEqual(3, len(one_sided[KEVIN_BACON, CARY_ELWES]))
+
+    def test_compact(self):
+        load(self.directory)
+        expected = {pair: None if path is None else len(path) for pair, path in self.all_paths().items()}
+        load(self.directory, compact=True)
+        for bidirectional in (False, True):
+            for (source, target), path in self.all_paths(bidirectional).items():
+                self.assertEqual(expected[source, target], None if path is None else len(path))
+                if path is not None:
+                    self.assertValidPath(source, target, path)
+
+    def test_snapshot(self):
+        load(self.directory, compact=True)
+        self.assertTrue(os.path.exists(snapshot_path(self.directory)))
+        self.assertIsNotNone(read_snapshot(self.directory))
+        expected = self.all_paths()
+        load(self.directory, compact=True)
+        self.assertEqual(expected, self.all_paths())
+
+        with open(os.path.join(self.directory, "stars.csv"), "a") as f:
+            f.write(f"{EMMA_WATSON},{APOLLO_13}\n")
+        self.assertIsNone(read_snapshot(self.directory))
+        load(self.directory, compact=True)
+        self.assertEqual([(APOLLO_13, EMMA_WATSON)], degrees.shortest_path(KEVIN_BACON, EMMA_WATSON))
+        self.assertIsNotNone(read_snapshot(self.directory))
+
+
+    def test_snapshot_of_growing_csv(self):
+        stars = os.path.join(self.directory, "stars.csv")
+        ingest = degrees.ingest
+
+        def ingest_then_append(*args):
+            rs = ingest(*args)
+            with open(stars, "a") as f:
+                f.write(f"{EMMA_WATSON},{APOLLO_13}\n")
+            return rs
+
+        degrees.ingest = ingest_then_append
+        try:
+            load(self.directory, compact=True)
+        finally:
+            degrees.ingest = ingest
+        self.assertIsNone(degrees.shortest_path(KEVIN_BACON, EMMA_WATSON))
+        # The snapshot holds the rows read, not the CSVs as they ended up
+        self.assertIsNone(read_snapshot(self.directory))
+        load(self.directory, compact=True)
+        self.assertEqual([(APOLLO_13, EMMA_WATSON)], degrees.shortest_path(KEVIN_BACON, EMMA_WATSON))
+
+    def test_path_cache(self):
+        load(self.directory)
+        cache = PathCache(2)
+        path = degrees.shortest_path(KEVIN_BACON, CARY_ELWES)
+        cache.put(KEVIN_BACON, CARY_ELWES, path)
+        self.assertEqual((True, path), cache.get(KEVIN_BACON, CARY_ELWES))
+        hit, reversed_path = cache.get(CARY_ELWES, KEVIN_BACON)
+        self.assertTrue(hit)
+        self.assertEqual(len(path), len(reversed_path))
+        self.assertValidPath(CARY_ELWES, KEVIN_BACON, reversed_path)
+
+        cache.put(TOM_HANKS, EMMA_WATSON, None)
+        self.assertEqual((True, None), cache.get(EMMA_WATSON, TOM_HANKS))
+        cache.put(TOM_HANKS, ROBIN_WRIGHT, degrees.shortest_path(TOM_HANKS, ROBIN_WRIGHT))
+        # The least recently used entry made way
+        self.assertEqual((False, None), cache.get(KEVIN_BACON, CARY_ELWES))
+
+
+    def test_enable_cache(self):
+        load(self.directory, compact=True)
+        degrees.enable_cache(10)
+        path = degrees.shortest_path(KEVIN_BACON, CARY_ELWES)
+        self.assertEqual(path, degrees.shortest_path(KEVIN_BACON, CARY_ELWES))
+        reversed_path = degrees.shortest_path(CARY_ELWES, KEVIN_BACON)
+        self.assertEqual(len(path), len(reversed_path))
+        self.assertValidPath(CARY_ELWES, KEVIN_BACON, reversed_path)
+        stats = degrees.path_cache.stats()
+        self.assertEqual((1, 2, 1), (stats["size"], stats["hits"], stats["misses"]))
+
+    def test_landmarks(self):
+        directory = os.path.join(os.path.dirname(self.directory), "synthetic")
+        write_graph(directory, people=150, movies=70, cast=3)
+        load(directory, compact=True, use_snapshot=False)
+        people = sorted(degrees.people)
+        pairs = list(itertools.product(people[:25], people))
+        expected = {pair: degrees.shortest_path(*pair) for pair in pairs}
+        self.assertIn(None, expected.values())
+        for count, prune in itertools.product((2, 8, 16), (False, True)):
+            degrees.build_landmarks(count, prune)
+            tight = 0
+            for (source, target), path in expected.items():
+                found = degrees.shortest_path(source, target)
+                message = f"{count} landmarks, prune={prune}, {source} to {target}"
+                if path is None:
+                    self.assertIsNone(found, message)
+                    continue
+                self.assertEqual(len(path), len(found), message)
+                self.assertValidPath(source, target, found)
+                lower, upper, _ = degrees.landmarks.bounds(degrees.graph.person_index[source],
+                                                           degrees.graph.person_index[target])
+                self.assertLessEqual(lower, len(path), message)
+                tight += lower == upper
+            # Some answers came from the landmark trees alone
+            self.assertGreater(tight, 0)
+        degrees.landmarks = None
+
+    def test_disconnected(self):
+        for compact in (False, True):
+            load(self.directory, compact)
+            profiler = degrees.enable_profiling()
+            self.assertFalse(degrees.connected(KEVIN_BACON, EMMA_WATSON))
+            self.assertIsNone(degrees.shortest_path(KEVIN_BACON, EMMA_WATSON))
+            self.assertIsNone(degrees.shortest_path(EMMA_WATSON, KEVIN_BACON, bidirectional=True))
+            self.assertEqual([0, 0], [record["nodes_expanded"] for record in profiler.records])
+            degrees.disable_profiling()
+
+    def test_updates(self):
+        for compact in (False, True):
+            load(self.directory, compact)
+            degrees.add_person("1", "New Person", "2000")
+            self.assertFalse(degrees.connected("1", KEVIN_BACON))
+            degrees.add_star("1", APOLLO_13)
+            self.assertEqual([(APOLLO_13, "1")], degrees.shortest_path(KEVIN_BACON, "1"))
+
+            # A new movie joining Emma Watson's component to everyone else's
+            degrees.add_movie("2", "New Movie", "2024")
+            degrees.add_star(EMMA_WATSON, "2")
+            self.assertFalse(degrees.connected(EMMA_WATSON, KEVIN_BACON))
+            degrees.add_star("1", "2")
+            self.assertTrue(degrees.connected(EMMA_WATSON, KEVIN_BACON))
+            path = degrees.shortest_path(EMMA_WATSON, KEVIN_BACON)
+            self.assertEqual(2, len(path))
+            self.assertValidPath(EMMA_WATSON, KEVIN_BACON, path)
+
+            degrees.remove_star("1", "2")
+            self.assertIsNone(degrees.shortest_path(EMMA_WATSON, KEVIN_BACON))
+            degrees.remove_person("1")
+            self.assertNotIn("1", degrees.people)
+            degrees.remove_movie("2")
+            self.assertNotIn("2", degrees.movies)
+            self.assertEqual(3, len(degrees.shortest_path(KEVIN_BACON, CARY_ELWES)))
+
+
+    def test_follow(self):
+        for compact in (False, True):
+            load(self.directory, compact)
+            with open(os.path.join(self.directory, "people.csv"), "a") as f:
+                f.write('1,"New Person",2000\n')
+            with open(os.path.join(self.directory, "stars.csv"), "a") as f:
+                f.write(f"1,{APOLLO_13}\n1,")
+            # The unfinished last line waits for the next poll
+            self.assertEqual(2, follow.poll(self.directory))
+            self.assertEqual([(APOLLO_13, "1")], degrees.shortest_path(KEVIN_BACON, "1"))
+            with open(os.path.join(self.directory, "stars.csv"), "a") as f:
+                f.write("93779\n")
+            self.assertEqual(1, follow.poll(self.directory))
+            self.assertEqual([("93779", CARY_ELWES)], degrees.shortest_path("1", CARY_ELWES))
+            self.assertEqual(0, follow.poll(self.directory))
+            for name in ("people.csv", "stars.csv"):
+                shutil.copy(os.path.join(SMALL, name), self.directory)
+
+        load(self.directory)
+        self.assertRaises(ValueError, follow.follow_in_background, self.directory)
+        load(self.directory, compact=True)
+        stop = follow.follow_in_background(self.directory, interval=0.01)
+        try:
+            with open(os.path.join(self.directory, "stars.csv"), "a") as f:
+                f.write(f"{EMMA_WATSON},{APOLLO_13}\n")
+            deadline = time.monotonic() + 5
+            while degrees.shortest_path(KEVIN_BACON, EMMA_WATSON) is None and time.monotonic() < deadline:
+                time.sleep(0.01)
+        finally:
+            stop.set()
+        self.assertEqual([(APOLLO_13, EMMA_WATSON)], degrees.shortest_path(KEVIN_BACON, EMMA_WATSON))
+
+    def test_all_shortest_paths(self):
+        for compact in (False, True):
+            load(self.directory, compact)
+            paths = list(degrees.all_shortest_paths(KEVIN_BACON, CARY_ELWES))
+            # Through Tom Hanks or Gary Sinise to Robin Wright
+            self.assertEqual(2, len(paths))
+            self.assertEqual(2, len({tuple(path) for path in paths}))
+            for path in paths:
+                self.assertEqual(3, len(path))
+                self.assertValidPath(KEVIN_BACON, CARY_ELWES, path)
+            self.assertEqual(1, len(list(degrees.all_shortest_paths(KEVIN_BACON, CARY_ELWES, limit=1))))
+            self.assertEqual([], list(degrees.all_shortest_paths(KEVIN_BACON, EMMA_WATSON)))
+
+            for cost in (degrees.newer_movies_first, degrees.bigger_casts_first):
+                ranked = list(degrees.all_shortest_paths(KEVIN_BACON, ROBIN_WRIGHT, movie_cost=cost))
+                self.assertEqual(sorted(map(tuple, degrees.all_shortest_paths(KEVIN_BACON, ROBIN_WRIGHT))),
+                                 sorted(map(tuple, ranked)))
+                costs = [sum(cost(movie_id) for movie_id, _ in path) for path in ranked]
+                self.assertEqual(sorted(costs), costs)
+
+    def test_budget(self):
+        for compact in (False, True):
+            load(self.directory, compact)
+            for (source, target), path in self.all_paths().items():
+                if path is None:
+                    continue
+                for bidirectional, expansions in itertools.product((False, True), range(4)):
+                    found = degrees.shortest_path(source, target, bidirectional, max_expansions=expansions)
+                    if isinstance(found, BudgetExceeded):
+                        self.assertLessEqual(found.lower_bound, len(path))
+                    else:
+                        self.assertEqual(len(path), len(found))
+                paths = degrees.shortest_paths(source, [target], max_expansions=1)
+                if isinstance(paths[target], BudgetExceeded):
+                    self.assertLessEqual(paths[target].lower_bound, len(path))
+            self.assertEqual(BudgetExceeded(1),
+                             degrees.shortest_path(KEVIN_BACON, CARY_ELWES, deadline=time.monotonic() - 1))
+
+
+    def test_spill(self):
+        directory = os.path.join(os.path.dirname(self.directory), "synthetic")
+        write_graph(directory, people=50, movies=30, cast=4)
+        with open(os.path.join(directory, "stars.csv"), "a") as f:
+            # A duplicate credit is dropped either way
+            f.write("p0,m0\np0,m0\n")
+        load(directory, compact=True, use_snapshot=False)
+        expected = self.all_paths()
+        arrays = [getattr(degrees.graph, name).tobytes() for name in ("person_movies", "movie_stars")]
+        load(directory, compact=True, use_snapshot=False, chunk_size=16, spill_threshold=64)
+        # Credit sized arrays live in temporary files once the credits spilled
+        self.assertIsInstance(degrees.graph.person_movies.obj, mmap.mmap)
+        self.assertEqual(arrays, [getattr(degrees.graph, name).tobytes() for name in ("person_movies", "movie_stars")])
+        self.assertEqual(expected, self.all_paths())
+
+    def test_search_people(self):
+        for compact in (False, True):
+            load(self.directory, compact)
+            degrees.build_name_index()
+            self.assertEqual([TOM_HANKS, "129"], [person["id"] for person in degrees.search_people("tom", 2)])
+            self.assertEqual([{"id": KEVIN_BACON, "name": "Kevin Bacon", "birth": "1958", "distance": 1}],
+                             degrees.search_people("  Kevn Bacon ", 1))
+            # The index follows runtime changes
+            degrees.add_person("1", "Kevin Baconn", "2000")
+            self.assertEqual([KEVIN_BACON, "1"], [person["id"] for person in degrees.search_people("kevin bacon")])
+            degrees.remove_person("1")
+            self.assertEqual([KEVIN_BACON], [person["id"] for person in degrees.search_people("kevin bacon")])
+
+    def test_batch(self):
+        load(self.directory, compact=True)
+        lines = ["Kevin Bacon,Tom Hanks", "Tom Cruise,Cary Elwes", "Nobody Here,102", "",
+                 "102,Cary Elwes", "Emma Watson,102", "129,129", "Tom Cruise,Kevn Bacon"]
+        expected = [
+            (1, KEVIN_BACON, TOM_HANKS, 1),
+            (2, "129", CARY_ELWES, 4),
+            (3, "Nobody Here", "102", "Person 'Nobody Here' not found."),
+            (5, KEVIN_BACON, CARY_ELWES, 3),
+            (6, EMMA_WATSON, KEVIN_BACON, None),
+            (7, "129", "129", 0),
+            (8, "Tom Cruise", "Kevn Bacon", "Person 'Kevn Bacon' not found, closest matches are ['102']."),
+        ]
+        outputs = []
+        for workers, max_in_flight in ((1, None), (2, None), (2, 1)):
+            out = io.StringIO()
+            # Line 5 is answered with line 1 by the first group, before line 2
+            batch.run_batch(lines, out, workers, max_in_flight)
+            records = [json.loads(line) for line in out.getvalue().splitlines()]
+            self.assertEqual(expected, [(record["line"], record["source"], record["target"],
+                                         record.get("error", record.get("degrees"))) for record in records])
+            for record in records:
+                if record.get("path"):
+                    self.assertValidPath(record["source"], record["target"], record["path"])
+            outputs.append(out.getvalue())
+        self.assertEqual(outputs[0], outputs[1])
+        self.assertEqual(outputs[0], outputs[2])
+
+    def test_profiling(self):
+        load(self.directory, compact=True)
+        sunk = []
+        profiler = degrees.enable_profiling(keep=2, sink=sunk.append)
+        degrees.enable_cache()
+        degrees.shortest_path(KEVIN_BACON, CARY_ELWES)
+        degrees.shortest_path(CARY_ELWES, KEVIN_BACON)
+        degrees.shortest_path(KEVIN_BACON, EMMA_WATSON)
+        degrees.shortest_path(KEVIN_BACON, ROBIN_WRIGHT, bidirectional=True)
+        degrees.disable_profiling()
+        degrees.shortest_path(KEVIN_BACON, TOM_HANKS)
+
+        self.assertEqual([3, 3, None, 2], [record["degrees"] for record in sunk])
+        self.assertEqual([False, True, False, False], [record["cached"] for record in sunk])
+        self.assertEqual(sunk[2:], list(profiler.records))
+        searched = sunk[0]
+        self.assertGreater(searched["nodes_expanded"], 1)
+        self.assertGreaterEqual(searched["edges_scanned"], searched["nodes_expanded"])
+        self.assertLessEqual(searched["neighbor_seconds"], searched["latency_seconds"])
+        # Cached and disconnected answers expand nobody
+        self.assertEqual([0, 0], [record["nodes_expanded"] for record in sunk[1:3]])
+
+        summary = profiler.summary()
+        self.assertEqual(4, summary["queries"])
+        self.assertEqual({"queries", "nodes_expanded", "edges_scanned", "peak_frontier",
+                          "neighbor_us", "bookkeeping_us", "latency_us"}, set(summary))
+        for name in set(summary) - {"queries"}:
+            self.assertEqual(4, sum(summary[name].values()), name)
+        self.assertEqual(2, summary["nodes_expanded"]["0-0"])
+        for record in sunk[::3]:
+            low = 1 << (record["nodes_expanded"].bit_length() - 1)
+            self.assertIn(f"{low}-{2 * low - 1}", summary["nodes_expanded"])
+
+if __name__ == "__main__":
+    main()
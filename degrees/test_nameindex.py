@@ -0,0 +1,63 @@
+import random
+from unittest import TestCase, main
+
+from nameindex import EXACT, FUZZY, PREFIX, NameIndex, edit_distance
+
+
+def levenshtein(a, b):
+    previous = list(range(len(b) + 1))
+    for i, char in enumerate(a, start=1):
+        current = [i]
+        for j, other in enumerate(b, start=1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char != other)))
+        previous = current
+    return previous[-1]
+
+
+class NameIndexTest(TestCase):
+    def test_edit_distance(self):
+        rng = random.Random(12)
+        for _ in range(2000):
+            a = "".join(rng.choice("abc ") for _ in range(rng.randrange(9)))
+            b = "".join(rng.choice("abc ") for _ in range(rng.randrange(9)))
+            limit = rng.randrange(4)
+            distance = levenshtein(a, b)
+            self.assertEqual(min(distance, limit + 1), edit_distance(a, b, limit), (a, b, limit))
+
+    def test_ranking(self):
+        index = NameIndex(["tom aaaaaaaaaaaa", "tom abbbbbbbbbb", "tom c", "tomas", "tom", "tim", "kevin bacon"])
+        self.assertEqual([(EXACT, 0, "tom"), (PREFIX, 2, "tom c"), (PREFIX, 2, "tomas")], index.search("tom", 3))
+        # Closest prefixes first, not the first ones in sorted order
+        self.assertEqual([(EXACT, 0, "tom"), (PREFIX, 2, "tom c")], index.search("tom", 2))
+        self.assertEqual([(PREFIX, 1, "tom"), (PREFIX, 3, "tom c"), (PREFIX, 3, "tomas")], index.search("to", 3))
+        self.assertEqual([(FUZZY, 1, "kevin bacon")], index.search("kevn bacon"))
+        self.assertEqual([(FUZZY, 2, "kevin bacon")], index.search("kevn bacn"))
+        self.assertEqual([], index.search("kevn bcn"))
+        self.assertEqual([(FUZZY, 3, "kevin bacon")], index.search("kevn bcn", max_distance=3))
+
+    def test_limit(self):
+        index = NameIndex([f"anna {i}" for i in range(20)] + ["hanna 1", "anne 1"])
+        self.assertEqual(5, len(index.search("anna", 5)))
+        self.assertTrue(all(rank == PREFIX for rank, _, _ in index.search("anna", 20)))
+        # Fuzzy matches only fill what prefixes leave
+        matches = index.search("anna 1", 20)
+        self.assertEqual(20, len(matches))
+        self.assertEqual([(EXACT, 0, "anna 1")] + [(PREFIX, 1, f"anna 1{i}") for i in range(10)],
+                         matches[:11])
+        self.assertEqual(sorted(matches), matches)
+        self.assertEqual(FUZZY, matches[-1][0])
+
+    def test_add_remove(self):
+        index = NameIndex(["kevin bacon"])
+        index.add("kevin costner")
+        index.add("kevin costner")
+        self.assertEqual(["kevin bacon", "kevin costner"], index.sorted_names)
+        self.assertEqual([(FUZZY, 1, "kevin costner")], index.search("kevin costnex"))
+        index.remove("kevin bacon")
+        index.remove("kevin bacon")
+        self.assertEqual([], index.search("kevn bacon"))
+        self.assertEqual([(PREFIX, 8, "kevin costner")], index.search("kevin"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+import asyncio
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+from unittest import TestCase, main
+
+import server
+from test_degrees import load, write_graph
+
+
+async def request(port, method, target, body=b""):
+    """
+    Returns (status, JSON result) of one request to the server on port.
+    """
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(f"{method} {target} HTTP/1.1\r\nContent-Length: {len(body)}\r\n\r\n".encode("latin-1") + body)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, body = response.partition(b"\r\n\r\n")
+    return int(head.split()[1]), json.loads(body)
+
+
+class Server(TestCase):
+    def setUp(self):
+        self.directory = os.path.join(tempfile.mkdtemp(), "synthetic")
+        write_graph(self.directory, people=3000, movies=1500, cast=4)
+        load(self.directory, compact=True, use_snapshot=False)
+        self.server = server.QueryServer(workers=2, timeout=30)
+        self.server.start_pool()
+
+    def tearDown(self):
+        self.server.close()
+        shutil.rmtree(os.path.dirname(self.directory))
+
+    def test_batch_leaves_room(self):
+        rng = random.Random(17)
+        pairs = [[f"p{rng.randrange(3000)}", f"p{rng.randrange(3000)}"] for _ in range(1500)]
+
+        async def scenario():
+            listener = await asyncio.start_server(self.server.handle, "127.0.0.1", 0)
+            port = listener.sockets[0].getsockname()[1]
+            async with listener:
+                batch = asyncio.create_task(request(port, "POST", "/batch", json.dumps({"pairs": pairs}).encode()))
+                await asyncio.sleep(0.2)
+                start = time.monotonic()
+                path = await request(port, "GET", "/path?source=p1&target=p2")
+                latency = time.monotonic() - start
+                running = not batch.done()
+                return path, latency, running, await batch
+
+        (status, record), latency, running, (batch_status, records) = asyncio.run(scenario())
+        self.assertEqual(200, status)
+        self.assertEqual(("p1", "p2"), (record["source"], record["target"]))
+        # Answered while the batch still had searches to run, without waiting for them
+        self.assertTrue(running)
+        self.assertLess(latency, 0.5)
+        self.assertEqual(200, batch_status)
+        self.assertEqual(list(range(1, len(pairs) + 1)), [record["line"] for record in records])
+
+
+if __name__ == "__main__":
+    main()
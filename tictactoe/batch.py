@@ -0,0 +1,108 @@
+"""
+Evaluate many Tic Tac Toe positions at once
+"""
+
+import gc
+import itertools
+import json
+import multiprocessing
+import sys
+import time
+
+import bitboard
+import book
+from tictactoe import X, O, EMPTY, to_position
+
+# Characters of a board written as 9 cells row by row
+MARKS = {"X": X, "O": O, ".": EMPTY, "-": EMPTY, "_": EMPTY}
+
+# Boards sent to a worker at a time
+CHUNK_SIZE = 256
+
+
+def parse_board(text):
+    """
+    Returns the board for 9 cell characters such as "XO.X.....",
+    ignoring whitespace and "|" or "," separators.
+    """
+    cells = [char for char in text.upper() if char not in " \t|,"]
+    if len(cells) != 9 or any(cell not in MARKS for cell in cells):
+        raise ValueError(f"expected 9 cells of X, O or ., got {text!r}")
+    return [[MARKS[cell] for cell in cells[i:i + 3]] for i in (0, 3, 6)]
+
+
+def optimal_cells(position):
+    """
+    Returns (value, every optimal cell) for a position.
+    """
+    entry = book.lookup(position)
+    if entry is not None:
+        return entry
+    value, _ = bitboard.solve(position)
+    if bitboard.terminal(position):
+        return value, []
+    return value, [cell for cell in bitboard.actions(position)
+                   if bitboard.solve(bitboard.result(position, cell))[0] == value]
+
+
+def evaluate(text):
+    """
+    Returns the result record of one board.
+    """
+    try:
+        position = to_position(parse_board(text))
+    except ValueError as e:
+        return {"board": text, "error": str(e)}
+    value, cells = optimal_cells(position)
+    return {"board": text, "value": value, "best_moves": [divmod(cell, 3) for cell in cells]}
+
+
+def evaluate_chunk(texts):
+    return [evaluate(text) for text in texts]
+
+
+def evaluate_many(boards, workers=1, chunk_size=CHUNK_SIZE):
+    """
+    Yields a result record for every board text, in order. Every board
+    shares the transposition table and opening book of the process, and
+    with more than one worker, chunks of boards go to a forked process pool
+    whose workers inherit both, already filled from the empty board.
+    """
+    boards = (text.strip() for text in boards)
+    boards = (text for text in boards if text and not text.startswith("#"))
+    if workers == 1:
+        for text in boards:
+            yield evaluate(text)
+        return
+
+    bitboard.solve(bitboard.initial_state())
+    book.load()
+    # As in degrees/batch.py, forked workers share these pages until they write to them
+    gc.freeze()
+    try:
+        context = multiprocessing.get_context("fork")
+        with context.Pool(workers) as pool:
+            chunks = iter(lambda: list(itertools.islice(boards, chunk_size)), [])
+            for records in pool.imap(evaluate_chunk, chunks):
+                yield from records
+    finally:
+        gc.unfreeze()
+
+
+def main():
+    if len(sys.argv) not in (2, 3):
+        sys.exit("Usage: python batch.py boards.txt [workers]")
+    workers = int(sys.argv[2]) if len(sys.argv) == 3 else 1
+
+    start = time.perf_counter()
+    count = 0
+    with open(sys.argv[1], encoding="utf-8") as f:
+        for record in evaluate_many(f, workers):
+            print(json.dumps(record))
+            count += 1
+    elapsed = time.perf_counter() - start
+    print(f"{count} positions in {elapsed:.2f}s, {count / max(elapsed, 1e-9):.0f} positions/s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+import argparse
+import os
+import time
+
+import mnk
+
+
+def bench_parallel(game, position, depth, max_workers, radius=None):
+    """
+    Time a fixed depth search serially, then split over 1, 2, 4, ... workers.
+    """
+    searcher = mnk.Searcher(game, radius=radius)
+    start = time.perf_counter()
+    serial = searcher.search(position, max_depth=depth)
+    baseline = time.perf_counter() - start
+    print(f"   serial: {baseline:.4f}s, value {serial[0]}, cell {serial[1]}, {searcher.nodes} nodes")
+    yield "serial", serial[0]
+    workers = 1
+    while workers <= max_workers:
+        start = time.perf_counter()
+        value, cell, _ = mnk.parallel_search(game, position, workers, max_depth=depth, radius=radius)
+        elapsed = time.perf_counter() - start
+        print(f"{workers:>3} workers: {elapsed:.4f}s, speedup {baseline / elapsed:.2f}x, value {value}, cell {cell}")
+        yield workers, value
+        workers *= 2
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark parallel m,n,k searches.")
+    parser.add_argument("rows", nargs="?", type=int, default=4)
+    parser.add_argument("columns", nargs="?", type=int, default=4)
+    parser.add_argument("k", nargs="?", type=int, default=4)
+    parser.add_argument("--depth", type=int, default=6)
+    parser.add_argument("--radius", type=int, help="only try cells this close to a mark")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="largest worker count")
+    args = parser.parse_args()
+
+    game = mnk.Game(args.rows, args.columns, args.k)
+    values = dict(bench_parallel(game, game.initial_state(), args.depth, args.workers, args.radius))
+    if len(set(values.values())) != 1:
+        raise SystemExit("Searches disagree on the value.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Tic Tac Toe positions as bitboards
+"""
+
+# A position is a pair of 9 bit ints (x, o) with bit 3 * i + j set
+# for every cell (i, j) the player has marked
+FULL = (1 << 9) - 1
+
+WIN_MASKS = (
+    0b000000111, 0b000111000, 0b111000000,
+    0b001001001, 0b010010010, 0b100100100,
+    0b100010001, 0b001010100,
+)
+
+# WINNING[marks] is 1 if the marks of one player complete a line
+WINNING = bytes(any(marks & mask == mask for mask in WIN_MASKS) for marks in range(1 << 9))
+
+
+def symmetries():
+    """
+    Returns the 8 rotations and reflections of the board, each as a tuple
+    giving for every cell of the transformed board the cell it comes from.
+    """
+    rs = []
+    cells = tuple(range(9))
+    for _ in range(4):
+        # Rotate clockwise, then add the left-right mirror image
+        cells = tuple(cells[3 * (2 - j) + i] for i in range(3) for j in range(3))
+        rs.append(cells)
+        rs.append(tuple(cells[3 * i + 2 - j] for i in range(3) for j in range(3)))
+    return rs
+
+
+SYMMETRIES = symmetries()
+
+# PERMUTED[s][marks] is marks transformed by SYMMETRIES[s]
+PERMUTED = [
+    [sum(1 << k for k, cell in enumerate(symmetry) if marks >> cell & 1) for marks in range(1 << 9)]
+    for symmetry in SYMMETRIES
+]
+
+# Maps canonical position keys to (value, optimal cell in the canonical orientation or None)
+table = {}
+table_stats = {"hits": 0, "misses": 0}
+
+
+def initial_state():
+    return (0, 0)
+
+
+def x_to_move(position):
+    x, o = position
+    return (x | o).bit_count() % 2 == 0
+
+
+def actions(position):
+    """
+    Returns the free cells of a position.
+    """
+    free = FULL & ~(position[0] | position[1])
+    return [cell for cell in range(9) if free >> cell & 1]
+
+
+def result(position, cell):
+    x, o = position
+    if x_to_move(position):
+        return (x | 1 << cell, o)
+    return (x, o | 1 << cell)
+
+
+def utility(position):
+    """
+    Returns 1 if X has a line, -1 if O has, 0 otherwise.
+    """
+    x, o = position
+    return 1 if WINNING[x] else -1 if WINNING[o] else 0
+
+
+def terminal(position):
+    x, o = position
+    return bool(WINNING[x] or WINNING[o]) or x | o == FULL
+
+
+def canonical(position):
+    """
+    Returns (key, symmetry) for the smallest key of the position under any
+    of the SYMMETRIES, and the index of the symmetry giving it.
+    """
+    x, o = position
+    best = None
+    for s, permuted in enumerate(PERMUTED):
+        key = permuted[x] << 9 | permuted[o]
+        if best is None or key < best[0]:
+            best = (key, s)
+    return best
+
+
+def solve(position):
+    """
+    Returns (value, optimal cell) for a position, value being its utility
+    under optimal play and cell None on terminal positions.
+    Positions equal up to rotation or reflection share one table entry.
+    """
+    key, s = canonical(position)
+    entry = table.get(key)
+    if entry is not None:
+        table_stats["hits"] += 1
+        value, cell = entry
+        return value, None if cell is None else SYMMETRIES[s][cell]
+    table_stats["misses"] += 1
+
+    value, action = None, None
+    if terminal(position):
+        value = utility(position)
+    else:
+        best = 1 if x_to_move(position) else -1
+        for candidate in actions(position):
+            candidate_value = solve(result(position, candidate))[0]
+            if value is None or (candidate_value - value) * best > 0:
+                value, action = candidate_value, candidate
+            # Nothing beats a win
+            if value == best:
+                break
+    table[key] = (value, None if action is None else SYMMETRIES[s].index(action))
+    return value, action
+
+
+def clear_table():
+    table.clear()
+    table_stats.update(hits=0, misses=0)
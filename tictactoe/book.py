@@ -0,0 +1,121 @@
+"""
+Perfect play opening book for Tic Tac Toe
+"""
+
+import os
+import struct
+import sys
+from array import array
+
+import bitboard
+
+BOOK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tictactoe.book")
+MAGIC = b"TTTBOOK1"
+# Magic and entry count, followed by one little endian uint32 per entry
+HEADER = struct.Struct("<8sI")
+
+# Maps canonical position keys to (value, mask of optimal cells in the canonical orientation),
+# None until load is first called
+entries = None
+
+
+def reachable():
+    """
+    Returns every position reachable from the empty board in its canonical
+    orientation, as a dict per number of marks mapping keys to positions.
+    """
+    layers = [{0: bitboard.initial_state()}]
+    while layers[-1]:
+        layer = {}
+        for position in layers[-1].values():
+            if bitboard.terminal(position):
+                continue
+            for cell in bitboard.actions(position):
+                key, _ = bitboard.canonical(bitboard.result(position, cell))
+                layer.setdefault(key, (key >> 9, key & bitboard.FULL))
+        layers.append(layer)
+    return layers[:-1]
+
+
+def solve_all():
+    """
+    Retrograde analysis: value every reachable position from the fullest
+    boards back to the empty one. Returns entries as described above.
+    """
+    rs = {}
+    for layer in reversed(reachable()):
+        for key, position in layer.items():
+            if bitboard.terminal(position):
+                rs[key] = (bitboard.utility(position), 0)
+                continue
+            sign = 1 if bitboard.x_to_move(position) else -1
+            values = {cell: rs[bitboard.canonical(bitboard.result(position, cell))[0]][0]
+                      for cell in bitboard.actions(position)}
+            value = sign * max(sign * value for value in values.values())
+            rs[key] = (value, sum(1 << cell for cell, cell_value in values.items() if cell_value == value))
+    return rs
+
+
+def pack(key, value, moves):
+    return key << 11 | (value + 1) << 9 | moves
+
+
+def unpack(packed):
+    return packed >> 11, ((packed >> 9 & 3) - 1, packed & bitboard.FULL)
+
+
+def build(path=BOOK_PATH):
+    """
+    Solve every reachable position and write the book. Returns the entry count.
+    """
+    packed = array("I", sorted(pack(key, value, moves) for key, (value, moves) in solve_all().items()))
+    if sys.byteorder == "big":
+        packed.byteswap()
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, len(packed)))
+        packed.tofile(f)
+    os.replace(tmp, path)
+    return len(packed)
+
+
+def load(path=BOOK_PATH):
+    """
+    Read the book into entries if not done yet. A missing or unreadable
+    book leaves entries empty, so lookups fall back to searching.
+    """
+    global entries
+    if entries is not None:
+        return entries
+    entries = {}
+    try:
+        with open(path, "rb") as f:
+            magic, count = HEADER.unpack(f.read(HEADER.size))
+            if magic != MAGIC:
+                return entries
+            packed = array("I")
+            packed.fromfile(f, count)
+    except (OSError, EOFError, struct.error):
+        return entries
+    if sys.byteorder == "big":
+        packed.byteswap()
+    entries = dict(map(unpack, packed))
+    return entries
+
+
+def lookup(position):
+    """
+    Returns (value, optimal cells) for a position from the book,
+    or None if the book is missing.
+    """
+    key, s = bitboard.canonical(position)
+    entry = (entries if entries is not None else load()).get(key)
+    if entry is None:
+        return None
+    value, moves = entry
+    symmetry = bitboard.SYMMETRIES[s]
+    return value, sorted(symmetry[cell] for cell in range(9) if moves >> cell & 1)
+
+
+if __name__ == "__main__":
+    print(f"Wrote {build()} positions to {BOOK_PATH}")
@@ -0,0 +1,362 @@
+"""
+m,n,k games: k in a row on a board of any size
+"""
+
+import multiprocessing
+import os
+import time
+
+# Score of a won position, above anything a heuristic may return
+WIN = 1 << 20
+INFINITY = 1 << 30
+
+# Kinds of transposition table values
+EXACT, LOWER, UPPER = 0, 1, 2
+
+# Nodes searched between deadline checks
+CHECK_INTERVAL = 256
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+class Game():
+    """
+    k in a row on a board of rows by columns cells. Positions are pairs of
+    bitboards (x, o), as in bitboard.py, with bit columns * i + j for cell (i, j).
+    """
+
+    def __init__(self, rows=3, columns=3, k=3):
+        if not 0 < k <= max(rows, columns):
+            raise ValueError("k must fit on the board")
+        self.rows = rows
+        self.columns = columns
+        self.k = k
+        self.cells = rows * columns
+        self.full = (1 << self.cells) - 1
+        self.lines = []
+        for i in range(rows):
+            for j in range(columns):
+                for di, dj in ((0, 1), (1, 0), (1, 1), (1, -1)):
+                    end_i, end_j = i + di * (k - 1), j + dj * (k - 1)
+                    if 0 <= end_i < rows and 0 <= end_j < columns:
+                        self.lines.append(sum(1 << self.cell(i + di * step, j + dj * step) for step in range(k)))
+        # Lines through each cell, the only ones a move there can complete
+        self.lines_through = [[line for line in self.lines if line >> cell & 1] for cell in range(self.cells)]
+        # Central cells take part in more lines, so they are tried first
+        center_i, center_j = (rows - 1) / 2, (columns - 1) / 2
+        self.order = sorted(range(self.cells),
+                            key=lambda cell: abs(cell // columns - center_i) + abs(cell % columns - center_j))
+
+    def cell(self, i, j):
+        return self.columns * i + j
+
+    def neighborhoods(self, radius):
+        """
+        Returns for every cell the mask of cells at most radius rows and columns away.
+        """
+        rs = []
+        for cell in range(self.cells):
+            i, j = divmod(cell, self.columns)
+            rs.append(sum(1 << self.cell(a, b)
+                          for a in range(max(0, i - radius), min(self.rows, i + radius + 1))
+                          for b in range(max(0, j - radius), min(self.columns, j + radius + 1))))
+        return rs
+
+    def initial_state(self):
+        return (0, 0)
+
+    def x_to_move(self, position):
+        x, o = position
+        return (x | o).bit_count() % 2 == 0
+
+    def actions(self, position):
+        """
+        Returns the free cells of a position, central ones first.
+        """
+        taken = position[0] | position[1]
+        return [cell for cell in self.order if not taken >> cell & 1]
+
+    def result(self, position, cell):
+        x, o = position
+        if (x | o) >> cell & 1:
+            raise ValueError("invalid action")
+        if self.x_to_move(position):
+            return (x | 1 << cell, o)
+        return (x, o | 1 << cell)
+
+    def completes_line(self, marks, cell):
+        """
+        Returns True if marks, which include cell, complete a line through cell.
+        """
+        return any(marks & line == line for line in self.lines_through[cell])
+
+    def utility(self, position):
+        """
+        Returns 1 if X has a line, -1 if O has, 0 otherwise.
+        """
+        x, o = position
+        for line in self.lines:
+            if x & line == line:
+                return 1
+            if o & line == line:
+                return -1
+        return 0
+
+    def terminal(self, position):
+        return self.utility(position) != 0 or position[0] | position[1] == self.full
+
+
+def open_lines(game, position):
+    """
+    Default heuristic: every line only one player has marks on counts the
+    square of those marks for that player. Scores favour X when positive.
+    """
+    x, o = position
+    score = 0
+    for line in game.lines:
+        x_marks = (x & line).bit_count()
+        o_marks = (o & line).bit_count()
+        if not o_marks:
+            score += x_marks * x_marks
+        elif not x_marks:
+            score -= o_marks * o_marks
+    return score
+
+
+class Searcher():
+    """
+    Iterative deepening negamax with alpha-beta pruning over a Game.
+    Positions cut off by depth are scored by heuristic(game, position),
+    which must stay within WIN of zero. The transposition table and history
+    scores ordering moves are kept between searches.
+    With radius set, only cells within radius of a marked cell are tried,
+    as is usual for Gomoku sized boards, so results are no longer exact.
+    """
+
+    def __init__(self, game, heuristic=open_lines, radius=None):
+        self.game = game
+        self.heuristic = heuristic
+        self.neighborhoods = None if radius is None else game.neighborhoods(radius)
+        # Maps positions to (depth, value, kind, best cell)
+        self.table = {}
+        # Depth weighted count of cutoffs caused by each cell
+        self.history = [0] * game.cells
+        self.nodes = 0
+        self.deadline = None
+
+    def search(self, position, time_limit=None, max_depth=None):
+        """
+        Returns (value, cell, depth) for the deepest search completed within
+        time_limit seconds, value being from the point of view of the player
+        to move, or None on terminal positions.
+        Depth 1 always completes. Deepening stops early once the position
+        is solved: a win or loss was proven or the search reached every end.
+        Among root moves of equal value the first in game.order is chosen.
+        """
+        if self.game.terminal(position):
+            return None
+        free = self.game.full & ~(position[0] | position[1])
+        deadline = None if time_limit is None else time.monotonic() + time_limit
+        best = None
+        for depth in range(1, min(max_depth or free.bit_count(), free.bit_count()) + 1):
+            self.deadline = deadline if best is not None else None
+            try:
+                value, cell = self.search_root(position, depth)
+            except SearchTimeout:
+                break
+            best = (value, cell, depth)
+            if abs(value) >= WIN:
+                break
+        self.deadline = None
+        return best
+
+    def search_root(self, position, depth):
+        """
+        Returns (value, cell) for the best move of a non terminal position.
+        Every move is searched just below the best value so far, so moves
+        tying it get their exact value, and the tie can be broken the same
+        way as in parallel_search whatever order the moves were tried in.
+        """
+        self.nodes += 1
+        game = self.game
+        x, o = position
+        free = game.full & ~(x | o)
+        x_moves = (x | o).bit_count() % 2 == 0
+        entry = self.table.get(position)
+        best, best_cell = -INFINITY, None
+        for cell in self.ordered_moves(x | o, None if entry is None else entry[3]):
+            if x_moves:
+                marks, child = x | 1 << cell, (x | 1 << cell, o)
+            else:
+                marks, child = o | 1 << cell, (x, o | 1 << cell)
+            if game.completes_line(marks, cell):
+                value = WIN + free.bit_count() - 1
+            else:
+                value = -self.negamax(child, depth - 1, -INFINITY, -(best - 1))
+            if value > best or value == best and game.order.index(cell) < game.order.index(best_cell):
+                best, best_cell = value, cell
+        self.table[position] = (depth, best, EXACT, best_cell)
+        return best, best_cell
+
+    def negamax(self, position, depth, alpha, beta):
+        """
+        Returns the value of a non terminal position for the player to move.
+        Values within depth of the end of the game are exact.
+        """
+        self.nodes += 1
+        if self.deadline is not None and self.nodes % CHECK_INTERVAL == 0 and time.monotonic() > self.deadline:
+            raise SearchTimeout()
+        game = self.game
+        x, o = position
+        free = game.full & ~(x | o)
+        if not free:
+            return 0
+        x_moves = (x | o).bit_count() % 2 == 0
+        if depth == 0:
+            score = self.heuristic(game, position)
+            return score if x_moves else -score
+        # A search as deep as the free cells never stops on the heuristic
+        depth = min(depth, free.bit_count())
+
+        table_cell = None
+        entry = self.table.get(position)
+        if entry is not None:
+            entry_depth, value, kind, table_cell = entry
+            if entry_depth >= depth:
+                if kind == EXACT:
+                    return value
+                if kind == LOWER:
+                    alpha = max(alpha, value)
+                else:
+                    beta = min(beta, value)
+                if alpha >= beta:
+                    return value
+
+        original_alpha = alpha
+        best, best_cell = -INFINITY, None
+        for cell in self.ordered_moves(x | o, table_cell):
+            if x_moves:
+                marks, child = x | 1 << cell, (x | 1 << cell, o)
+            else:
+                marks, child = o | 1 << cell, (x, o | 1 << cell)
+            if game.completes_line(marks, cell):
+                # Quicker wins leave more cells free and score higher
+                value = WIN + free.bit_count() - 1
+            else:
+                value = -self.negamax(child, depth - 1, -beta, -alpha)
+            if value > best:
+                best, best_cell = value, cell
+            if value > alpha:
+                alpha = value
+            if alpha >= beta:
+                self.history[cell] += depth * depth
+                break
+
+        kind = UPPER if best <= original_alpha else LOWER if best >= beta else EXACT
+        self.table[position] = (depth, best, kind, best_cell)
+        return best
+
+    def ordered_moves(self, taken, first=None):
+        """
+        Returns the cells to try, first one first, then by history score.
+        """
+        candidates = self.game.full & ~taken
+        if self.neighborhoods is not None and taken:
+            near = 0
+            marks = taken
+            while marks:
+                low = marks & -marks
+                near |= self.neighborhoods[low.bit_length() - 1]
+                marks ^= low
+            # Fall back to every free cell when the neighborhoods are full
+            candidates = candidates & near or candidates
+        cells = [cell for cell in self.game.order if candidates >> cell & 1]
+        cells.sort(key=self.history.__getitem__, reverse=True)
+        if first is not None:
+            cells.remove(first)
+            cells.insert(0, first)
+        return cells
+
+
+# Searcher of a parallel_search worker process and the bound its workers share, see init_worker
+worker = None
+shared_alpha = None
+
+
+def init_worker(game, heuristic, radius, alpha):
+    global worker, shared_alpha
+    worker = Searcher(game, heuristic, radius)
+    shared_alpha = alpha
+
+
+def search_move(position, cell, depth, deadline):
+    """
+    Returns the value of playing cell for the player to move, exact if it is
+    at least the best value found so far by any worker, else an upper bound.
+    Returns None if deadline passed first.
+    """
+    game = worker.game
+    x, o = position
+    free = game.full & ~(x | o)
+    if game.x_to_move(position):
+        marks, child = x | 1 << cell, (x | 1 << cell, o)
+    else:
+        marks, child = o | 1 << cell, (x, o | 1 << cell)
+    if game.completes_line(marks, cell):
+        return WIN + free.bit_count() - 1
+    alpha = shared_alpha.value
+    worker.deadline = deadline
+    try:
+        # Search just below alpha so a move tying the best so far gets its exact value
+        value = -worker.negamax(child, depth - 1, -INFINITY, -(alpha - 1))
+    except SearchTimeout:
+        return None
+    finally:
+        worker.deadline = None
+    with shared_alpha.get_lock():
+        if value > shared_alpha.value:
+            shared_alpha.value = value
+    return value
+
+
+def parallel_search(game, position, workers=os.cpu_count(), time_limit=None, max_depth=None,
+                    heuristic=open_lines, radius=None):
+    """
+    Searcher.search with the root moves split over a forked process pool.
+    At every depth the most promising move is searched first on its own,
+    then the others in parallel, each worker starting from the best value
+    any worker has found (young brothers wait). Returns (value, cell, depth)
+    as Searcher.search finds at that depth, ties included.
+    """
+    if game.terminal(position):
+        return None
+    context = multiprocessing.get_context("fork")
+    alpha = context.Value("q", -INFINITY)
+    moves = Searcher(game, heuristic, radius).ordered_moves(position[0] | position[1])
+    free = game.full & ~(position[0] | position[1])
+    deadline = None if time_limit is None else time.monotonic() + time_limit
+    best = None
+    with context.Pool(workers, init_worker, (game, heuristic, radius, alpha)) as pool:
+        for depth in range(1, min(max_depth or free.bit_count(), free.bit_count()) + 1):
+            alpha.value = -INFINITY
+            # Depth 1 always completes
+            depth_deadline = deadline if best is not None else None
+            values = [pool.apply(search_move, (position, moves[0], depth, depth_deadline))]
+            if values[0] is None:
+                break
+            values += pool.starmap(search_move, [(position, cell, depth, depth_deadline) for cell in moves[1:]],
+                                   chunksize=1)
+            if None in values:
+                break
+            # Only moves tying the best value have exact values, see search_move
+            value = max(values)
+            cell = min((cell for cell, cell_value in zip(moves, values) if cell_value == value), key=game.order.index)
+            best = (value, cell, depth)
+            if abs(value) >= WIN:
+                break
+            # Best first at the next depth, ties keeping their order
+            order = sorted(range(len(moves)), key=lambda i: -values[i])
+            moves = [moves[i] for i in order]
+    return best
@@ -1,5 +1,7 @@
+import concurrent.futures
 import pygame
 import sys
+import threading
 import time
 
 import tictactoe as ttt
@@ -17,14 +19,41 @@ mediumFont = pygame.font.Font("OpenSans-Regular.ttf", 28)
 largeFont = pygame.font.Font("OpenSans-Regular.ttf", 40)
 moveFont = pygame.font.Font("OpenSans-Regular.ttf", 60)
 
+# Searches run on a background thread so the window keeps responding,
+# one at a time so they share the transposition table safely
+executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+
+# Seconds the computer appears to think for at least
+think_time = 0.5
+
+# With --ponder, replies to every possible user move are searched while the user thinks
+ponder = "--ponder" in sys.argv
+
+
+def ponder_replies(board, stop):
+    """
+    Solve every position the user can move to, leaving the computer's
+    replies in the transposition table, until stop is set. A future cannot
+    stop a search already running, so the flag is checked between replies.
+    """
+    for action in ttt.actions(board):
+        if stop.is_set():
+            return
+        ttt.solve(ttt.result(board, action))
+
+
 user = None
 board = ttt.initial_state()
-ai_turn = False
+ai_move = None
+ai_started = None
+# Stop event of the pondering in progress, if any
+pondering = None
 
 while True:
 
     for event in pygame.event.get():
         if event.type == pygame.QUIT:
+            executor.shutdown(wait=False, cancel_futures=True)
             sys.exit()
 
     screen.fill(black)
@@ -102,21 +131,23 @@ while True:
         elif user == player:
             title = f"Play as {user}"
         else:
-            title = f"Computer thinking..."
+            title = "Computer thinking" + "." * (int(time.monotonic() * 3) % 4)
         title = largeFont.render(title, True, white)
         titleRect = title.get_rect()
         titleRect.center = ((width / 2), 30)
         screen.blit(title, titleRect)
 
-        # Check for AI move
+        # Check for AI move, polling its search instead of waiting for it
         if user != player and not game_over:
-            if ai_turn:
-                time.sleep(0.5)
-                move = ttt.minimax(board)
-                board = ttt.result(board, move)
-                ai_turn = False
-            else:
-                ai_turn = True
+            if ai_move is None:
+                ai_move = executor.submit(ttt.minimax, board)
+                ai_started = time.monotonic()
+            elif ai_move.done() and time.monotonic() - ai_started >= think_time:
+                board = ttt.result(board, ai_move.result())
+                ai_move = None
+        elif ponder and not game_over and pondering is None:
+            pondering = threading.Event()
+            executor.submit(ponder_replies, board, pondering)
 
         # Check for a user move
         click, _, _ = pygame.mouse.get_pressed()
@@ -126,6 +157,10 @@ while True:
                 for j in range(3):
                     if (board[i][j] == ttt.EMPTY and tiles[i][j].collidepoint(mouse)):
                         board = ttt.result(board, (i, j))
+                        # The computer's move waits for pondering to stop
+                        if pondering is not None:
+                            pondering.set()
+                            pondering = None
 
         if game_over:
             againButton = pygame.Rect(width / 3, height - 65, width / 3, 50)
@@ -141,6 +176,5 @@ while True:
                     time.sleep(0.2)
                     user = None
                     board = ttt.initial_state()
-                    ai_turn = False
 
     pygame.display.flip()
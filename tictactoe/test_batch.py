@@ -0,0 +1,21 @@
+from unittest import TestCase, main
+from batch import evaluate_many, parse_board
+from tictactoe import X, O, EMPTY
+
+
+class Batch(TestCase):
+    def test_parse_board(self):
+        self.assertEqual([[X, O, EMPTY], [EMPTY, X, EMPTY], [EMPTY, EMPTY, O]], parse_board("XO. .X. ..O"))
+        self.assertRaises(ValueError, lambda: parse_board("XO"))
+        self.assertRaises(ValueError, lambda: parse_board("XOZ......"))
+
+    def test_evaluate_many(self):
+        records = list(evaluate_many(["XX.OO....", "# comment", "", "XXXOO....", "oops"]))
+        self.assertEqual(3, len(records))
+        self.assertEqual({"board": "XX.OO....", "value": 1, "best_moves": [(0, 2)]}, records[0])
+        self.assertEqual({"board": "XXXOO....", "value": 1, "best_moves": []}, records[1])
+        self.assertIn("error", records[2])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+import random
+from unittest import TestCase, main
+from mnk import Game, Searcher, WIN, parallel_search
+import bitboard
+
+
+class MNK(TestCase):
+    def test_lines(self):
+        self.assertEqual(8, len(Game(3, 3, 3).lines))
+        self.assertEqual(10, len(Game(4, 4, 4).lines))
+        self.assertRaises(ValueError, lambda: Game(3, 3, 4))
+
+    def test_matches_tictactoe(self):
+        game = Game(3, 3, 3)
+        searcher = Searcher(game)
+        position = game.initial_state()
+        while not game.terminal(position):
+            value, cell, _ = searcher.search(position)
+            # Perfect play from the empty board is a draw
+            self.assertEqual(0, value)
+            self.assertEqual(0, bitboard.solve(game.result(position, cell))[0])
+            position = game.result(position, cell)
+        self.assertEqual(0, game.utility(position))
+
+    def test_finds_win(self):
+        game = Game(4, 4, 3)
+        value, _, _ = Searcher(game).search(game.initial_state())
+        self.assertGreaterEqual(value, WIN)
+
+    def test_time_limit(self):
+        game = Game(7, 7, 5)
+        value, cell, depth = Searcher(game, radius=1).search(game.initial_state(), time_limit=0.2)
+        self.assertLess(abs(value), WIN)
+        self.assertGreaterEqual(depth, 1)
+        self.assertIn(cell, game.actions(game.initial_state()))
+
+    def test_parallel_search(self):
+        rng = random.Random(24)
+        for game in (Game(4, 4, 4), Game(4, 5, 3)):
+            for _ in range(6):
+                position = game.initial_state()
+                for _ in range(rng.randrange(8)):
+                    cell = rng.choice(game.actions(position))
+                    if game.terminal(game.result(position, cell)):
+                        break
+                    position = game.result(position, cell)
+                depth = rng.randint(1, 4)
+                with self.subTest(rows=game.rows, columns=game.columns, position=position, depth=depth):
+                    serial = Searcher(game).search(position, max_depth=depth)
+                    self.assertEqual(serial, parallel_search(game, position, 2, max_depth=depth))
+        game = Game(4, 4, 4)
+        position = (32784, 12288)
+        self.assertEqual(Searcher(game).search(position, max_depth=2), parallel_search(game, position, 2, max_depth=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,9 @@
+import os
+import tempfile
 from unittest import TestCase, main
-from tictactoe import initial_state, player, actions, result, winner, terminal, X, O, EMPTY
+from tictactoe import initial_state, player, actions, result, winner, terminal, minimax, solve, X, O, EMPTY
+import book
+import tictactoe
 
 
 class Tictactoe(TestCase):
@@ -52,6 +56,55 @@ class Tictactoe(TestCase):
                  [O, X, O]]
         self.assertTrue(terminal(board))
 
+    def test_minimax(self):
+        board = [[X, X, EMPTY],
+                 [O, O, EMPTY],
+                 [EMPTY, EMPTY, EMPTY]]
+        self.assertEqual((0, 2), minimax(board))
+        board = [[X, EMPTY, EMPTY],
+                 [O, O, EMPTY],
+                 [X, EMPTY, EMPTY]]
+        self.assertEqual((1, 2), minimax(board))
+        self.assertEqual(0, solve(initial_state())[0])
+
+    def test_transposition_table(self):
+        tictactoe.clear_table()
+        # With a book built, solve would answer from it without the table
+        entries = book.entries
+        book.entries = {}
+        try:
+            board = [[X, EMPTY, EMPTY],
+                     [EMPTY, O, EMPTY],
+                     [EMPTY, EMPTY, EMPTY]]
+            value, action = solve(board)
+            misses = tictactoe.table_stats["misses"]
+            self.assertGreater(misses, 0)
+            # The same position rotated a quarter turn is answered from the table
+            rotated = [[EMPTY, EMPTY, X],
+                       [EMPTY, O, EMPTY],
+                       [EMPTY, EMPTY, EMPTY]]
+            rotated_value, rotated_action = solve(rotated)
+            self.assertEqual(misses, tictactoe.table_stats["misses"])
+            self.assertEqual(value, rotated_value)
+            self.assertEqual(value, solve(result(rotated, rotated_action))[0])
+        finally:
+            book.entries = entries
+
+    def test_book(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "tictactoe.book")
+            self.assertEqual(765, book.build(path))
+            book.entries = None
+            try:
+                book.load(path)
+                board = [[X, X, EMPTY],
+                         [O, O, EMPTY],
+                         [EMPTY, EMPTY, EMPTY]]
+                self.assertEqual((1, [2]), book.lookup(tictactoe.to_position(board)))
+                self.assertEqual((0, 2), minimax(board))
+            finally:
+                book.entries = None
+
 
 if __name__ == "__main__":
     main()